@@ -0,0 +1,155 @@
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing.util import Finalize
+
+BATCH_PROCESSES = int(os.environ.get("QA_BATCH_PROCESSES", "2"))
+
+
+def read_url_list(path):
+    """
+    :param path: Text file with one URL per line, blank lines and lines starting with # are skipped.
+    :return: List of URLs.
+    """
+    with open(path, 'r', encoding='utf-8') as file:
+        return [line.strip() for line in file if line.strip() and not line.lstrip().startswith("#")]
+
+
+def read_done_targets(output_path):
+    """
+    Reads the pages already tested by a previous run of the batch, so a restarted batch resumes where it stopped.
+    A last line cut by a crash is removed from the file.
+    :param output_path: JSONL results file.
+    :return: Set of targets whose record has the 'done' status.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    valid_size = 0
+    with open(output_path, 'rb') as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            valid_size += len(line)
+            if record.get("status") == "done":
+                done.add(record["target"])
+    if valid_size != os.path.getsize(output_path):
+        with open(output_path, 'r+b') as file:
+            file.truncate(valid_size)
+    return done
+
+
+def init_worker():
+    # Worker processes exit without running atexit handlers, quit their browsers explicitly
+    from tests import browser_pool
+    Finalize(None, browser_pool.close_browser_pool, exitpriority=10)
+
+
+def test_target(kind, target, mode, profile):
+    """
+    Tests one page in a worker process.
+    :param kind: 'html' for a file path, 'url' for a URL.
+    :param target: File path or URL.
+    :param mode: 'static' or 'full'.
+    :param profile: Browser load profile.
+    :return: JSONL record of the page.
+    """
+    from qa_agent import execute_html_tests, execute_url_tests
+
+    started = time.perf_counter()
+    record = {"target": target, "kind": kind, "mode": mode}
+    try:
+        if kind == "html":
+            results = execute_html_tests(target, mode, profile)
+        else:
+            results = execute_url_tests(target, mode, profile)
+        if results is None:
+            raise ValueError("The file could not be read")
+        record.update(status="done", results=results)
+    except Exception as e:
+        record.update(status="failed", error=str(e))
+    record["seconds"] = round(time.perf_counter() - started, 3)
+    return record
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def run_batch(targets, output_path, processes=BATCH_PROCESSES, mode="full", profile=None):
+    """
+    Tests pages in a pool of processes, each with its own browser pool, and appends one JSONL record per page.
+    Pages already tested in output_path are skipped.
+    :param targets: List of (kind, target) tuples.
+    :param output_path: JSONL results file.
+    :param processes: Number of worker processes.
+    :param mode: 'static' or 'full'.
+    :param profile: Browser load profile.
+    :return: Summary dictionary with the throughput and latency percentiles.
+    """
+    done = read_done_targets(output_path)
+    # Targets listed several times are tested once, only the ones already in output_path count as skipped
+    unique_targets = list(dict.fromkeys(targets))
+    pending = [(kind, target) for kind, target in unique_targets if target not in done]
+    latencies = []
+    failed = 0
+    started = time.perf_counter()
+    with open(output_path, 'a', encoding='utf-8') as output, \
+            ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"),
+                                initializer=init_worker) as executor:
+        futures = [executor.submit(test_target, kind, target, mode, profile) for kind, target in pending]
+        for future in as_completed(futures):
+            record = future.result()
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+            latencies.append(record["seconds"])
+            failed += record["status"] != "done"
+            print(f"[{len(latencies)}/{len(pending)}] {record['status']} {record['target']} ({record['seconds']}s)",
+                  file=sys.stderr)
+    elapsed = time.perf_counter() - started
+    return {
+        "pages": len(latencies),
+        "failed": failed,
+        "skipped": len(unique_targets) - len(pending),
+        "seconds": round(elapsed, 3),
+        "pages_per_second": round(len(latencies) / elapsed, 3) if elapsed and latencies else 0.0,
+        "p50_seconds": percentile(latencies, 0.5),
+        "p95_seconds": percentile(latencies, 0.95),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the QA agent on many pages and write the results as JSONL.")
+    parser.add_argument("--glob", dest="patterns", action="append", default=[],
+                        help="Glob of HTML files to test, e.g. 'generated_html/**/*.html'. Can be repeated.")
+    parser.add_argument("--urls", help="Text file with one URL to test per line.")
+    parser.add_argument("--output", default="qa_results.jsonl",
+                        help="JSONL results file, pages already in it are skipped.")
+    parser.add_argument("--processes", type=int, default=BATCH_PROCESSES, help="Number of worker processes.")
+    parser.add_argument("--mode", choices=["static", "full"], default="full")
+    parser.add_argument("--profile", choices=["full", "light"], default=None, help="Browser load profile.")
+    args = parser.parse_args(argv)
+
+    targets = [("html", path) for pattern in args.patterns for path in sorted(glob.glob(pattern, recursive=True))]
+    if args.urls:
+        targets += [("url", url) for url in read_url_list(args.urls)]
+    if not targets:
+        parser.error("no pages to test, give --glob and/or --urls")
+
+    summary = run_batch(targets, args.output, args.processes, args.mode, args.profile)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
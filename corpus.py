@@ -0,0 +1,98 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import site_generator
+
+CORPUS_PROCESSES = int(os.environ.get("QA_CORPUS_PROCESSES", "2"))
+
+
+def build_page(index, output_dir, seed, links, forms, buttons, bug_rate):
+    """
+    Generates one page of the corpus in a worker process and writes it with its bug manifest.
+    :param index: Page number, the page seed is seed + index so the corpus does not depend on the process count.
+    :param output_dir: Directory of the corpus.
+    :return: Record of the page, with its paths and number of bugs.
+    """
+    page = site_generator.generate_page(seed + index, links, forms, buttons, bug_rate)
+    name = f"page_{index:06d}"
+    html_path = os.path.join(output_dir, f"{name}.html")
+    manifest_path = os.path.join(output_dir, f"{name}.json")
+    with open(html_path, "w", encoding="utf-8") as file:
+        file.write(page["html"])
+    manifest = {
+        "page": f"{name}.html",
+        "seed": page["seed"],
+        "template": page["template"],
+        "size": {"links": links, "forms": forms, "buttons": buttons},
+        "bug_rate": bug_rate,
+        "bugs": page["bugs"],
+    }
+    with open(manifest_path, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2)
+    return {"page": html_path, "manifest": manifest_path, "bugs": len(page["bugs"]), "bytes": len(page["html"])}
+
+
+def build_corpus(count, output_dir, seed=0, links=10, forms=2, buttons=5, bug_rate=0.3, processes=CORPUS_PROCESSES):
+    """
+    Generates a corpus of buggy pages in a pool of processes, every page next to a JSON manifest of its injected bugs.
+    The same arguments always give the same corpus.
+    :param count: Number of pages.
+    :param output_dir: Directory of the corpus, created if missing.
+    :param seed: Seed of the first page.
+    :param links: Number of link components per page.
+    :param forms: Number of form components per page.
+    :param buttons: Number of button components per page.
+    :param bug_rate: Probability of each component to be buggy.
+    :param processes: Number of worker processes.
+    :return: Summary dictionary with the number of pages, bugs and bytes written and the generation rate.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    build = partial(build_page, output_dir=output_dir, seed=seed, links=links, forms=forms, buttons=buttons,
+                    bug_rate=bug_rate)
+    bugs = 0
+    size = 0
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn")) as executor:
+        for done, record in enumerate(executor.map(build, range(count), chunksize=max(1, count // (processes * 8))),
+                                      start=1):
+            bugs += record["bugs"]
+            size += record["bytes"]
+            if done % 1000 == 0 or done == count:
+                print(f"[{done}/{count}] pages written", file=sys.stderr)
+    elapsed = time.perf_counter() - started
+    return {
+        "pages": count,
+        "bugs": bugs,
+        "bytes": size,
+        "seconds": round(elapsed, 3),
+        "pages_per_second": round(count / elapsed, 3) if elapsed and count else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a corpus of buggy pages with a JSON manifest of their bugs.")
+    parser.add_argument("--count", type=int, required=True, help="Number of pages to generate.")
+    parser.add_argument("--output-dir", default="generated_html/corpus", help="Directory of the corpus.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the first page, page i uses seed + i.")
+    parser.add_argument("--links", type=int, default=10, help="Link components per page.")
+    parser.add_argument("--forms", type=int, default=2, help="Form components per page.")
+    parser.add_argument("--buttons", type=int, default=5, help="Button components per page.")
+    parser.add_argument("--bug-rate", type=float, default=0.3, help="Probability of each component to be buggy.")
+    parser.add_argument("--processes", type=int, default=CORPUS_PROCESSES, help="Number of worker processes.")
+    args = parser.parse_args(argv)
+    if not 0 <= args.bug_rate <= 1:
+        parser.error("--bug-rate must be between 0 and 1")
+
+    summary = build_corpus(args.count, args.output_dir, args.seed, args.links, args.forms, args.buttons,
+                           args.bug_rate, args.processes)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+from urllib.parse import urlparse
+
+from qa_agent import execute_url_tests
+from result_cache import CACHE_DIR
+from scheduler import family_failure
+from tests.link_cache import normalize_url
+
+MAX_DEPTH = int(os.environ.get("QA_CRAWL_MAX_DEPTH", "2"))
+MAX_PAGES = int(os.environ.get("QA_CRAWL_MAX_PAGES", "50"))
+# Largest limits a client may request for one crawl
+DEPTH_LIMIT = int(os.environ.get("QA_CRAWL_DEPTH_LIMIT", "5"))
+PAGES_LIMIT = int(os.environ.get("QA_CRAWL_PAGES_LIMIT", "500"))
+CONCURRENCY = int(os.environ.get("QA_CRAWL_CONCURRENCY", "2"))
+POLITENESS_DELAY = float(os.environ.get("QA_CRAWL_DELAY", "1.0"))
+
+# Links to files that are not web pages are not crawled
+SKIPPED_EXTENSIONS = (".pdf", ".zip", ".gz", ".tar", ".rar", ".7z", ".exe", ".dmg", ".jpg", ".jpeg", ".png", ".gif",
+                      ".svg", ".webp", ".ico", ".mp3", ".mp4", ".avi", ".mov", ".webm", ".css", ".js", ".json",
+                      ".xml", ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx")
+
+PENDING, IN_PROGRESS, DONE = 0, 1, 2
+
+
+def get_origin(url):
+    parsed_url = urlparse(normalize_url(url))
+    return parsed_url.scheme, parsed_url.netloc
+
+
+def is_crawlable(url, origin):
+    """
+    :param url: Absolute URL found on a crawled page.
+    :param origin: (scheme, netloc) tuple of the crawl start page.
+    :return: True if the URL is a same-origin web page.
+    """
+    parsed_url = urlparse(url)
+    if parsed_url.scheme not in ("http", "https"):
+        return False
+    return get_origin(url) == origin and not parsed_url.path.lower().endswith(SKIPPED_EXTENSIONS)
+
+
+class CrawlFrontier:
+    """
+    Frontier and visited set of a crawl, both kept in a temporary SQLite file
+    so crawling a large site does not grow the server memory.
+    Pages are handed out breadth first.
+    """
+
+    def __init__(self, directory=CACHE_DIR or None):
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        handle, self.path = tempfile.mkstemp(prefix="crawl_", suffix=".sqlite3", dir=directory)
+        os.close(handle)
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute("CREATE TABLE pages (url TEXT PRIMARY KEY, depth INTEGER, state INTEGER)")
+        self._connection.execute("CREATE INDEX pending_pages ON pages (state, depth)")
+        self._lock = threading.Lock()
+
+    def add(self, url, depth):
+        """
+        Adds a URL to the frontier unless it was already seen.
+        :return: True if the URL is new.
+        """
+        with self._lock:
+            cursor = self._connection.execute("INSERT OR IGNORE INTO pages VALUES (?, ?, ?)",
+                                              (normalize_url(url), depth, PENDING))
+            self._connection.commit()
+            return cursor.rowcount > 0
+
+    def pop(self):
+        """
+        Takes the next pending page, shallowest first.
+        :return: (URL, depth) tuple, or None when the frontier is empty.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT rowid, url, depth FROM pages WHERE state = ? ORDER BY depth, rowid LIMIT 1", (PENDING,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute("UPDATE pages SET state = ? WHERE rowid = ?", (IN_PROGRESS, row[0]))
+            self._connection.commit()
+            return row[1], row[2]
+
+    def done(self, url):
+        with self._lock:
+            self._connection.execute("UPDATE pages SET state = ? WHERE url = ?", (DONE, url))
+            self._connection.commit()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+        os.remove(self.path)
+
+
+class HostThrottle:
+    """Spaces out the page loads sent to the same host by a minimum delay."""
+
+    def __init__(self, delay=POLITENESS_DELAY):
+        self.delay = delay
+        self._next_allowed = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_allowed.get(host, now))
+            self._next_allowed[host] = start + self.delay
+        time.sleep(start - now)
+
+
+def crawl(start_url, max_depth=MAX_DEPTH, max_pages=MAX_PAGES, concurrency=CONCURRENCY, delay=POLITENESS_DELAY,
+          test_page=execute_url_tests):
+    """
+    Crawls a site from a start page and tests every same-origin page found, several pages at a time.
+    :param start_url: URL of the first page.
+    :param max_depth: Maximum number of links followed from the start page.
+    :param max_pages: Maximum number of pages tested.
+    :param concurrency: Number of pages tested at the same time.
+    :param delay: Minimum number of seconds between two page loads on the same host.
+    :param test_page: Callable returning the test results of a URL.
+    :return: Generator of (URL, depth, results) tuples, in the order the pages finish.
+    """
+    origin = get_origin(start_url)
+    frontier = CrawlFrontier()
+    throttle = HostThrottle(delay)
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="qa-crawl")
+
+    def run(url):
+        throttle.wait(urlparse(url).netloc)
+        return test_page(url)
+
+    frontier.add(start_url, 0)
+    started = 0
+    in_flight = {}
+    try:
+        while True:
+            while len(in_flight) < concurrency and started < max_pages:
+                page = frontier.pop()
+                if page is None:
+                    break
+                in_flight[executor.submit(run, page[0])] = page
+                started += 1
+            if not in_flight:
+                break
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                url, depth = in_flight.pop(future)
+                try:
+                    results = future.result()
+                except Exception as e:
+                    results = family_failure("page", f"Exception: {str(e)}")
+                frontier.done(url)
+                if depth < max_depth:
+                    # The link tests already extracted the page's links as absolute URLs
+                    for link in (results or {}).get("links", {}):
+                        if is_crawlable(link, origin):
+                            frontier.add(link, depth + 1)
+                yield url, depth, results
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        frontier.close()
+
+
+def execute_crawl_tests(url, max_depth=MAX_DEPTH, max_pages=MAX_PAGES, profile=None):
+    """
+    Crawls a site and returns the test results of every page.
+    :param url: URL of the first page.
+    :param max_depth: Maximum number of links followed from the start page.
+    :param max_pages: Maximum number of pages tested.
+    :param profile: Browser load profile, see tests.load_profiles.
+    :return: Dictionary mapping each tested URL to its depth and results.
+    """
+    pages = {}
+    test_page = partial(execute_url_tests, profile=profile)
+    for page_url, depth, results in crawl(url, max_depth, max_pages, test_page=test_page):
+        pages[page_url] = {"depth": depth, "results": results}
+    return pages
@@ -1,7 +1,15 @@
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import openai
 from typing import Optional
 from pydantic import BaseModel
 from fastapi import FastAPI
+from result_cache import ResultCache, content_hash
+from tests.component_cache import normalize_html
 
 app = FastAPI()
 
@@ -10,6 +18,28 @@ with open('openAI_Key', 'r') as file:
     OPENAI_API_KEY = file.read().strip()
     openai.api_key = OPENAI_API_KEY
 
+# Suggestions already generated, keyed by the failure they explain, an empty TTL keeps them until evicted
+SUGGESTION_CACHE_TTL = os.environ.get("QA_SUGGESTION_CACHE_TTL", "")
+suggestion_cache = ResultCache("fix_suggestions",
+                               memory_entries=int(os.environ.get("QA_SUGGESTION_CACHE_ENTRIES", "512")),
+                               ttl=float(SUGGESTION_CACHE_TTL) if SUGGESTION_CACHE_TTL else None)
+
+# Bulk suggestions: failures packed in one prompt, prompts sent at the same time and model requests per minute
+SUGGESTION_BATCH_SIZE = int(os.environ.get("QA_SUGGESTION_BATCH_SIZE", "10"))
+SUGGESTION_CONCURRENCY = int(os.environ.get("QA_SUGGESTION_CONCURRENCY", "4"))
+SUGGESTION_RATE = float(os.environ.get("QA_SUGGESTION_RATE", "20"))
+
+SYSTEM_MESSAGE = "You are a helpful assistant skilled in debugging HTML code snippets."
+
+EXAMPLE_FIX = (
+    f"**Example Fix:**\n\n"
+    f"If the link 'https://dummies-profileapi.dummies.com/v2/sso/login' is broken, replace it with a valid link. Contact your backend team to get the correct link URL. Once you have the link, update the href value with the correct URL.\n\n"
+    f"Example:\n\n"
+    f"Replace 'https://dummies-profileapi.dummies.com/v2/sso/login' with 'https://valid-link.com/v2/sso/login'."
+)
+
+PLAIN_TEXT_INSTRUCTIONS = "Please provide your suggestion in plain text format. Avoid including HTML code or other special formatting characters. If the issue involves a URL, simply provide the corrected URL without additional formatting."
+
 
 class TestData(BaseModel):
     category: str
@@ -18,25 +48,89 @@ class TestData(BaseModel):
     code_snippet: Optional[str]
 
 
+def suggestion_key(category: str, test: str, code_snippet: Optional[str]) -> str:
+    """
+    Identifies a failure independently of the page and the run it was found in.
+    :return: Hash of the normalized category, test and code snippet.
+    """
+    return content_hash(" ".join(category.lower().split()), " ".join(test.split()), normalize_html(code_snippet or ""))
+
+
 def execute_fix_suggestion(category: str, item: str, test: str, code_snippet: Optional[str]) -> str:
-    prompt = (
+    # The same failure found on another page or in another run gets the same suggestion
+    key = suggestion_key(category, test, code_snippet)
+    suggestion = suggestion_cache.get(key)
+    if suggestion is not None:
+        return suggestion
+
+    prompt = build_prompt(category, item, test, code_snippet)
+    suggestion = request_completion(prompt)
+    suggestion_cache.put(key, suggestion)
+    return suggestion
+
+
+class RateLimiter:
+    """Spaces out the model requests so that at most per_minute of them start in any minute."""
+
+    def __init__(self, per_minute=SUGGESTION_RATE):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next_allowed = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_allowed)
+            self._next_allowed = start + self.interval
+        time.sleep(start - now)
+
+
+# Shared by every request of the process, single and bulk suggestions draw from the same budget
+rate_limiter = RateLimiter()
+
+
+def build_prompt(category: str, item: str, test: str, code_snippet: Optional[str]) -> str:
+    return (
         f"Here is a bug in the code:\n\n"
         f"Code:\n{code_snippet}\n\n"
         f"Failed Test: {test}\n\n"
         f"Category: {category}\n"
         f"Item: {item}\n\n"
         f"Can you suggest a fix for the above code?\n\n"
-        f"Please provide your suggestion in plain text format. Avoid including HTML code or other special formatting characters. If the issue involves a URL, simply provide the corrected URL without additional formatting.\n\n"
-        f"**Example Fix:**\n\n"
-        f"If the link 'https://dummies-profileapi.dummies.com/v2/sso/login' is broken, replace it with a valid link. Contact your backend team to get the correct link URL. Once you have the link, update the href value with the correct URL.\n\n"
-        f"Example:\n\n"
-        f"Replace 'https://dummies-profileapi.dummies.com/v2/sso/login' with 'https://valid-link.com/v2/sso/login'."
+        f"{PLAIN_TEXT_INSTRUCTIONS}\n\n"
+        f"{EXAMPLE_FIX}"
+    )
+
+
+def build_batch_prompt(failures) -> str:
+    """
+    :param failures: List of failure dictionaries, see collect_failures.
+    :return: Prompt asking for one suggestion per numbered bug, as a JSON object.
+    """
+    bugs = "\n\n".join(
+        f"Bug {number}:\n"
+        f"Code:\n{failure['code_snippet']}\n"
+        f"Failed Test: {failure['test']}\n"
+        f"Category: {failure['category']}\n"
+        f"Item: {failure['item']}"
+        for number, failure in enumerate(failures, start=1)
+    )
+    return (
+        f"Here are {len(failures)} bugs found in the same page:\n\n"
+        f"{bugs}\n\n"
+        f"Can you suggest a fix for each of the above bugs?\n\n"
+        f"{PLAIN_TEXT_INSTRUCTIONS}\n\n"
+        f"{EXAMPLE_FIX}\n\n"
+        f"Answer with a JSON object only, mapping each bug number to its suggestion, "
+        f"for example {{\"1\": \"...\", \"2\": \"...\"}}."
     )
 
-    messages = [
+
+def build_messages(prompt: str) -> list:
+    return [
         {
             "role": "system",
-            "content": "You are a helpful assistant skilled in debugging HTML code snippets."
+            "content": SYSTEM_MESSAGE
         },
         {
             "role": "user",
@@ -44,8 +138,152 @@ def execute_fix_suggestion(category: str, item: str, test: str, code_snippet: Op
         }
     ]
 
+
+def request_completion(prompt: str) -> str:
+    """Sends a prompt to the model once the rate limiter allows it, and returns the answer text."""
+    rate_limiter.wait()
     completion = openai.chat.completions.create(
         model="gpt-4",
-        messages=messages)
+        messages=build_messages(prompt))
 
     return completion.choices[0].message.content
+
+
+def stream_fix_suggestion(category: str, item: str, test: str, code_snippet: Optional[str]):
+    """
+    Same suggestion as execute_fix_suggestion, yielded piece by piece as the model writes it.
+    Closing the generator closes the model stream, so an abandoned request stops generating.
+    Only a suggestion the model finished is cached, a cached one is yielded at once.
+    :return: Generator of text pieces.
+    """
+    key = suggestion_key(category, test, code_snippet)
+    suggestion = suggestion_cache.get(key)
+    if suggestion is not None:
+        yield suggestion
+        return
+
+    rate_limiter.wait()
+    stream = openai.chat.completions.create(
+        model="gpt-4",
+        messages=build_messages(build_prompt(category, item, test, code_snippet)),
+        stream=True)
+    pieces = []
+    finish_reason = None
+    try:
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            token = chunk.choices[0].delta.content
+            if token:
+                pieces.append(token)
+                yield token
+            finish_reason = chunk.choices[0].finish_reason or finish_reason
+    finally:
+        stream.close()
+    # A suggestion cut short, by the token limit or a dropped stream, or left empty is generated again next time
+    suggestion = "".join(pieces)
+    if finish_reason == "stop" and suggestion.strip():
+        suggestion_cache.put(key, suggestion)
+
+
+def parse_batch_answer(answer: str, count: int) -> dict:
+    """
+    :param answer: Model answer to a batch prompt.
+    :param count: Number of bugs in the prompt.
+    :return: Dictionary of bug number to suggestion, bugs the answer skipped are missing.
+    """
+    match = re.search(r"\{.*\}", answer or "", re.DOTALL)  # Drops code fences and text around the object
+    try:
+        suggestions = json.loads(match.group(0)) if match else {}
+    except ValueError:
+        return {}
+    if not isinstance(suggestions, dict):
+        return {}
+    return {int(number): str(suggestion).strip() for number, suggestion in suggestions.items()
+            if str(number).isdigit() and 1 <= int(number) <= count and suggestion}
+
+
+def collect_failures(results: dict) -> list:
+    """
+    Lists the failed tests of a report, the way the results page marks them as failed.
+    :param results: unified_results report, {category: {item: {test: result, 'code_snippet': ...}}}.
+    :return: List of {category, item, test, code_snippet} dictionaries.
+    """
+    failures = []
+    for category, items in results.items():
+        if not isinstance(items, dict):
+            continue
+        for item, tests in items.items():
+            if not isinstance(tests, dict):
+                continue
+            for test, result in tests.items():
+                if test == "code_snippet" or not isinstance(result, str):
+                    continue
+                if result.split("-", 1)[0].strip().lower() == "failed":
+                    failures.append({"category": category, "item": item, "test": test,
+                                     "code_snippet": tests.get("code_snippet")})
+    return failures
+
+
+def suggest_batch(failures) -> dict:
+    """
+    Gets the suggestions of up to SUGGESTION_BATCH_SIZE failures with one model request.
+    Failures the answer left out are asked about one by one.
+    :param failures: List of failure dictionaries with their 'key'.
+    :return: Dictionary of suggestion key to suggestion.
+    """
+    answers = {}
+    if len(failures) > 1:
+        answers = parse_batch_answer(request_completion(build_batch_prompt(failures)), len(failures))
+    suggestions = {}
+    for number, failure in enumerate(failures, start=1):
+        suggestion = answers.get(number)
+        if suggestion is None:
+            suggestion = request_completion(build_prompt(failure["category"], failure["item"], failure["test"],
+                                                         failure["code_snippet"]))
+        suggestion_cache.put(failure["key"], suggestion)
+        suggestions[failure["key"]] = suggestion
+    return suggestions
+
+
+def execute_fix_suggestions(results: dict, batch_size: int = SUGGESTION_BATCH_SIZE,
+                            concurrency: int = SUGGESTION_CONCURRENCY) -> dict:
+    """
+    Suggests a fix for every failed test of a report in a few model requests.
+    Identical failures are asked about once, cached ones are not asked about at all, and the others are packed
+    batch_size per prompt, with up to concurrency prompts in flight under the shared rate limiter.
+    :param results: unified_results report.
+    :param batch_size: Maximum number of failures per prompt.
+    :param concurrency: Maximum number of prompts sent at the same time.
+    :return: Suggestions with the layout of the report, {category: {item: {test: suggestion}}}.
+             Failures whose prompt failed are left out, they can be retried with execute_fix_suggestion.
+    """
+    failures = collect_failures(results)
+    suggestions = {}
+    pending = {}
+    for failure in failures:
+        failure["key"] = suggestion_key(failure["category"], failure["test"], failure["code_snippet"])
+        if failure["key"] in suggestions or failure["key"] in pending:
+            continue
+        cached = suggestion_cache.get(failure["key"])
+        if cached is not None:
+            suggestions[failure["key"]] = cached
+        else:
+            pending[failure["key"]] = failure
+
+    pending = list(pending.values())
+    batches = [pending[start:start + batch_size] for start in range(0, len(pending), max(1, batch_size))]
+    if batches:
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(batches)))) as executor:
+            for future in [executor.submit(suggest_batch, batch) for batch in batches]:
+                try:
+                    suggestions.update(future.result())
+                except Exception as e:
+                    print(f"Error during bulk suggestion generation: {e}")
+
+    report = {}
+    for failure in failures:
+        if failure["key"] in suggestions:
+            report.setdefault(failure["category"], {}).setdefault(failure["item"], {})[failure["test"]] = \
+                suggestions[failure["key"]]
+    return report
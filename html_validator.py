@@ -0,0 +1,341 @@
+from html.parser import HTMLParser
+
+import requests
+
+VOID_ELEMENTS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track",
+                 "wbr", "param", "keygen"}
+
+# Roots of foreign content, SVG and MathML elements inside them may use the self-closing syntax
+FOREIGN_ELEMENTS = {"svg", "math"}
+# Foreign elements whose children are HTML again
+HTML_INTEGRATION_POINTS = {"foreignobject", "annotation-xml"}
+
+# Elements whose text is not parsed as markup, besides script and style which HTMLParser already handles
+RCDATA_ELEMENTS = {"textarea", "title"}
+
+# Element whose children form a separate document fragment, they are not checked against its content model
+TEMPLATE_ELEMENT = "template"
+
+# Elements whose end tag may be omitted, they are never reported as unclosed
+OPTIONAL_END_TAGS = {"html", "head", "body", "p", "li", "dt", "dd", "option", "optgroup", "tr", "td", "th",
+                     "thead", "tbody", "tfoot", "colgroup", "caption", "rb", "rt", "rtc", "rp"}
+
+# Start tags that close an open p element
+CLOSES_P = {"address", "article", "aside", "blockquote", "details", "dialog", "div", "dl", "fieldset",
+            "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hgroup",
+            "hr", "main", "menu", "nav", "ol", "p", "pre", "section", "table", "ul"}
+
+# Start tag -> open elements it implicitly closes
+IMPLIED_END = {
+    "li": {"li"},
+    "dt": {"dt", "dd"},
+    "dd": {"dt", "dd"},
+    "option": {"option"},
+    "optgroup": {"option", "optgroup"},
+    "tr": {"tr", "td", "th"},
+    "td": {"td", "th"},
+    "th": {"td", "th"},
+    "thead": {"thead", "tbody", "tfoot", "tr", "td", "th"},
+    "tbody": {"thead", "tbody", "tfoot", "tr", "td", "th"},
+    "tfoot": {"thead", "tbody", "tfoot", "tr", "td", "th"},
+    "body": {"head"},
+}
+
+# Elements that only accept phrasing content, flow elements must not appear inside them
+PHRASING_ONLY = {"span", "b", "i", "em", "strong", "small", "label", "abbr", "code", "q", "s", "sub", "sup", "u",
+                 "mark", "cite", "dfn", "kbd", "samp", "var", "time", "h1", "h2", "h3", "h4", "h5", "h6", "button",
+                 "pre"}
+FLOW_ONLY = {"div", "section", "article", "aside", "nav", "header", "footer", "main", "form", "table", "ul", "ol",
+             "dl", "blockquote", "figure", "fieldset", "address", "h1", "h2", "h3", "h4", "h5", "h6", "hr", "p",
+             "details", "menu"}
+
+# Interactive elements that must not appear inside a link or a button
+INTERACTIVE = {"a", "button", "select", "textarea", "input", "label", "iframe", "details", "embed", "audio",
+               "video"}
+
+# Element -> allowed parents
+ALLOWED_PARENTS = {
+    "li": {"ul", "ol", "menu"},
+    "option": {"select", "datalist", "optgroup"},
+    "optgroup": {"select"},
+    "dt": {"dl", "div"},
+    "dd": {"dl", "div"},
+    "legend": {"fieldset"},
+    "figcaption": {"figure"},
+    "summary": {"details"},
+}
+
+OBSOLETE_ELEMENTS = {"acronym", "applet", "basefont", "big", "blink", "center", "dir", "font", "frame",
+                     "frameset", "isindex", "marquee", "noframes", "strike", "tt", "xmp"}
+
+# Obsolete attribute -> elements it is obsolete on, None for any element
+OBSOLETE_ATTRIBUTES = {
+    "align": None,
+    "bgcolor": None,
+    "valign": None,
+    "background": None,
+    "cellpadding": {"table"},
+    "cellspacing": {"table"},
+    "frameborder": {"iframe"},
+    "scrolling": {"iframe"},
+    "marginwidth": {"iframe", "body"},
+    "marginheight": {"iframe", "body"},
+    "hspace": {"img", "iframe", "object"},
+    "vspace": {"img", "iframe", "object"},
+    "language": {"script"},
+    "name": {"a", "img"},
+    "nowrap": {"td", "th"},
+    "width": {"td", "th", "col", "hr", "pre", "table"},
+    "height": {"td", "th", "table"},
+    "border": {"img", "object"},
+    "clear": {"br"},
+    "link": {"body"},
+    "text": {"body"},
+    "vlink": {"body"},
+    "alink": {"body"},
+}
+
+# Element -> attributes it must have
+REQUIRED_ATTRIBUTES = {
+    "img": ["src"],
+    "optgroup": ["label"],
+    "area": ["alt"],
+    "bdo": ["dir"],
+}
+
+
+class ConformanceChecker(HTMLParser):
+    """
+    Tokenizes a document and reports the most common W3C conformance errors:
+    unclosed and misnested elements, stray end tags, duplicate ids, obsolete elements and attributes,
+    missing required attributes and disallowed nesting.
+    The text of textarea and title elements is not parsed as markup and the content of template elements
+    is not checked against the nesting rules, as in the HTML parser.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.messages = []
+        self.stack = []  # Open elements as (tag, line, start tag text)
+        self.ids = {}
+        self.seen_doctype = False
+        self.seen_tag = False
+        self.head_has_title = False
+        self.in_head = False
+
+    def report(self, message, extract, line=None, message_type="error"):
+        entry = {"type": message_type, "lastLine": line or self.getpos()[0], "message": message,
+                 "extract": extract}
+        if message_type == "info":
+            entry["subType"] = "warning"
+        self.messages.append(entry)
+
+    def open_tags(self):
+        return [tag for tag, _, _ in self.stack]
+
+    def pop_until(self, tag, extract):
+        """Pops the open elements up to and including tag, reporting the ones left unclosed."""
+        unclosed = []
+        while self.stack:
+            open_tag, line, text = self.stack.pop()
+            if open_tag == tag:
+                break
+            if open_tag not in OPTIONAL_END_TAGS:
+                unclosed.append((open_tag, line, text))
+        if unclosed:
+            self.report(f"End tag “{tag}” seen, but there were open elements.", extract)
+            for open_tag, line, text in unclosed:
+                self.report(f"Unclosed element “{open_tag}”.", text, line)
+
+    def handle_decl(self, decl):
+        if decl.lower().startswith("doctype"):
+            self.seen_doctype = True
+
+    def in_foreign_content(self):
+        """Whether the current node is inside an svg or math element, and not back in HTML through an integration point."""
+        for tag, _, _ in reversed(self.stack):
+            if tag in HTML_INTEGRATION_POINTS:
+                return False
+            if tag in FOREIGN_ELEMENTS:
+                return True
+        return False
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in FOREIGN_ELEMENTS or self.in_foreign_content():
+            # Self-closing foreign elements are complete, as in the HTML parser
+            self.handle_starttag(tag, attrs)
+            self.stack.pop()
+            return
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_ELEMENTS and self.stack and self.stack[-1][0] == tag:
+            self.report("Self-closing syntax (“/>”) used on a non-void HTML element. "
+                        "Ignoring the slash and treating as a start tag.", self.get_starttag_text())
+
+    def handle_starttag(self, tag, attrs):
+        extract = self.get_starttag_text()
+        line = self.getpos()[0]
+        if not self.seen_tag:
+            self.seen_tag = True
+            if not self.seen_doctype:
+                self.report("Start tag seen without seeing a doctype first. Expected “<!DOCTYPE html>”.", extract)
+
+        # SVG and MathML elements follow their own content models, only their ids are checked
+        if self.in_foreign_content():
+            self.check_id(tag, dict(attrs), extract)
+            self.stack.append((tag, line, extract))
+            return
+
+        # Implied end tags
+        if tag in CLOSES_P and "p" in self.open_tags():
+            self.pop_until("p", extract)
+        implied = IMPLIED_END.get(tag, set())
+        while self.stack and self.stack[-1][0] in implied:
+            self.stack.pop()
+        if tag == "body" and self.in_head:
+            self.close_head(extract)
+
+        if TEMPLATE_ELEMENT not in self.open_tags():
+            self.check_nesting(tag, attrs, extract)
+        self.check_attributes(tag, attrs, extract)
+
+        if tag == "head":
+            self.in_head = True
+        elif tag == "title":
+            self.head_has_title = True
+        if tag not in VOID_ELEMENTS:
+            self.stack.append((tag, line, extract))
+        if tag in RCDATA_ELEMENTS:
+            # The text up to the matching end tag is not markup, even with a self-closing slash
+            self.set_cdata_mode(tag)
+
+    def handle_endtag(self, tag):
+        extract = f"</{tag}>"
+        if self.in_foreign_content() and tag in self.open_tags():
+            self.pop_until(tag, extract)
+            return
+        if tag in VOID_ELEMENTS:
+            self.report(f"Stray end tag “{tag}”.", extract)
+            return
+        if tag == "head" and self.in_head:
+            self.close_head(extract)
+        if tag in self.open_tags():
+            self.pop_until(tag, extract)
+        elif tag == "p":
+            self.report("No “p” element in scope but a “p” end tag seen.", extract)
+        elif tag not in OPTIONAL_END_TAGS:
+            self.report(f"Stray end tag “{tag}”.", extract)
+
+    def close_head(self, extract):
+        self.in_head = False
+        if not self.head_has_title:
+            self.report("Element “head” is missing a required instance of child element “title”.", extract)
+
+    def check_nesting(self, tag, attrs, extract):
+        open_tags = self.open_tags()
+        parent = open_tags[-1] if open_tags else None
+
+        if tag == "form" and "form" in open_tags:
+            self.report("Saw a “form” start tag, but there was already an active “form” element. "
+                        "Nested forms are not allowed. Ignoring the tag.", extract)
+        if tag in INTERACTIVE and not (tag == "input" and dict(attrs).get("type") == "hidden"):
+            for ancestor in ("a", "button"):
+                if ancestor in open_tags:
+                    self.report(f"The element “{tag}” must not appear as a descendant of the “{ancestor}” element.",
+                                extract)
+        if parent in PHRASING_ONLY and tag in FLOW_ONLY:
+            self.report(f"Element “{tag}” not allowed as child of element “{parent}” in this context. "
+                        f"(Suppressing further errors from this subtree.)", extract)
+        allowed_parents = ALLOWED_PARENTS.get(tag)
+        if allowed_parents and parent not in allowed_parents:
+            self.report(f"Element “{tag}” not allowed as child of element “{parent or 'document'}” in this context. "
+                        f"(Suppressing further errors from this subtree.)", extract)
+
+    def check_attributes(self, tag, attrs, extract):
+        names = [name for name, _ in attrs]
+        values = {name: value for name, value in attrs}
+
+        for name in set(names):
+            if names.count(name) > 1:
+                self.report(f"Duplicate attribute “{name}”.", extract)
+
+        if tag in OBSOLETE_ELEMENTS:
+            self.report(f"The “{tag}” element is obsolete. Use CSS instead.", extract)
+        for name in names:
+            obsolete_on = OBSOLETE_ATTRIBUTES.get(name, ())
+            if obsolete_on is None or tag in obsolete_on:
+                if name == "name" and tag == "a":
+                    self.report("The “name” attribute on the “a” element is obsolete. "
+                                "Consider putting an “id” attribute on the nearest container instead.", extract)
+                else:
+                    self.report(f"The “{name}” attribute on the “{tag}” element is obsolete. Use CSS instead.",
+                                extract)
+
+        for name in REQUIRED_ATTRIBUTES.get(tag, []):
+            if name not in values:
+                self.report(f"Element “{tag}” is missing required attribute “{name}”.", extract)
+        if tag == "img" and "alt" not in values:
+            self.report("An “img” element must have an “alt” attribute, except under certain conditions. "
+                        "For details, consult guidance on providing text alternatives for images.", extract)
+        if tag == "input" and values.get("type", "").lower() == "image" and "alt" not in values:
+            self.report("Element “input” with attribute “type” whose value is “image” "
+                        "must have non-empty attribute “alt”.", extract)
+        if tag == "link" and "rel" not in values and "itemprop" not in values:
+            self.report("A “link” element must have a “rel” or “itemprop” attribute, but not both.", extract)
+        if tag == "form" and values.get("action") == "":
+            self.report("Bad value “” for attribute “action” on element “form”: Must be non-empty.", extract)
+        if tag == "html" and "lang" not in values:
+            self.report("Consider adding a “lang” attribute to the “html” start tag to declare the language "
+                        "of this document.", extract, message_type="info")
+
+        self.check_id(tag, values, extract)
+
+    def check_id(self, tag, values, extract):
+        if "id" in values:
+            element_id = values["id"] or ""
+            if element_id == "":
+                self.report(f"Bad value “” for attribute “id” on element “{tag}”: An ID must not be the empty string.",
+                            extract)
+            elif any(char.isspace() for char in element_id):
+                self.report(f"Bad value “{element_id}” for attribute “id” on element “{tag}”: "
+                            f"An ID must not contain whitespace.", extract)
+            elif element_id in self.ids:
+                self.report(f"Duplicate ID “{element_id}”.", extract)
+            else:
+                self.ids[element_id] = self.getpos()[0]
+
+    def close(self):
+        super().close()
+        unclosed = [(tag, line, text) for tag, line, text in self.stack if tag not in OPTIONAL_END_TAGS]
+        if unclosed:
+            self.report("End of file seen and there were open elements.", "")
+            for tag, line, text in unclosed:
+                self.report(f"Unclosed element “{tag}”.", text, line)
+        self.stack = []
+
+
+def check_html(html_content):
+    """
+    Checks the conformance of an HTML document.
+    :param html_content: HTML code.
+    :return: List of messages with the same {type, lastLine, message, extract} fields as the W3C validator.
+    """
+    checker = ConformanceChecker()
+    checker.feed(html_content)
+    checker.close()
+    return sorted(checker.messages, key=lambda message: message["lastLine"])
+
+
+def validate(url_or_file, content=None):
+    """
+    Offline replacement of w3c_validator.validate.
+    :param url_or_file: URL or file to validate.
+    :param content: Content of the document, read from url_or_file when not given.
+    :return: Dictionary with the list of messages, like the W3C validator response.
+    """
+    if content is None:
+        if url_or_file.startswith("http"):
+            content = requests.get(url_or_file, timeout=10).text
+        else:
+            with open(url_or_file, 'r', encoding='utf-8') as file:
+                content = file.read()
+    return {"messages": check_html(content)}
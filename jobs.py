@@ -0,0 +1,134 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+JOB_WORKERS = int(os.environ.get("QA_JOB_WORKERS", "2"))
+JOB_QUEUE_SIZE = int(os.environ.get("QA_JOB_QUEUE_SIZE", "20"))
+JOB_RETENTION = float(os.environ.get("QA_JOB_RETENTION", "3600"))
+JOB_MAX_RETAINED = int(os.environ.get("QA_JOB_MAX_RETAINED", "100"))
+
+
+class JobQueueFullError(Exception):
+    """Raised when a job is submitted while every worker is busy and the queue is full."""
+
+
+class Job:
+    """A test run executed in the background, with its status and result."""
+
+    def __init__(self, kind):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed")
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """
+    Runs jobs on a bounded pool of worker threads.
+    At most workers + queue_size jobs are admitted at once, further submissions are rejected
+    so an overload turns into queueing for the admitted jobs instead of timeouts for all of them.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, queue_size=JOB_QUEUE_SIZE, retention=JOB_RETENTION,
+                 max_retained=JOB_MAX_RETAINED):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.retention = retention
+        self.max_retained = max_retained
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="qa-job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _purge(self):
+        """Forgets finished jobs older than the retention period, then the oldest ones beyond max_retained."""
+        now = time.time()
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished and job.finished_at is not None]
+        expired = [job_id for job_id in finished if now - self._jobs[job_id].finished_at > self.retention]
+        for job_id in expired:
+            del self._jobs[job_id]
+        finished = [job_id for job_id in finished if job_id in self._jobs]
+        for job_id in finished[:max(0, len(finished) - self.max_retained)]:
+            del self._jobs[job_id]
+
+    def _finish(self, job, status, result=None, error=None):
+        # The finish time is set before the terminal status is published, readers never see a finished job without it
+        with self._lock:
+            job.result = result
+            job.error = error
+            job.finished_at = time.time()
+            job.status = status
+
+    def _run(self, job, function, args):
+        with self._lock:
+            job.started_at = time.time()
+            job.status = "running"
+        try:
+            result = function(*args)
+        except Exception as e:
+            self._finish(job, "failed", error=str(e))
+            raise
+        self._finish(job, "done", result=result)
+        return result
+
+    def submit(self, kind, function, *args):
+        """
+        Queues a job.
+        :param kind: Job type, e.g. 'test_url'.
+        :param function: Callable running the job.
+        :param args: Arguments passed to the callable.
+        :return: Job instance, its future resolves to the result of the callable.
+        """
+        with self._lock:
+            self._purge()
+            active = sum(1 for job in self._jobs.values() if not job.finished)
+            if active >= self.workers + self.queue_size:
+                raise JobQueueFullError(f"Too many test runs in progress ({active}), please retry later")
+            job = Job(kind)
+            self._jobs[job.id] = job
+            job.future = self._executor.submit(self._run, job, function, args)
+        return job
+
+    def discard(self, job):
+        """Forgets a job whose result was already handed to its caller, e.g. a synchronous test run."""
+        with self._lock:
+            self._jobs.pop(job.id, None)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def queue_position(self, job):
+        """
+        :return: Number of queued jobs ahead of the given job, None once it started.
+        """
+        if job.status != "queued":
+            return None
+        with self._lock:
+            return sum(1 for other in self._jobs.values()
+                       if other.status == "queued" and other.created_at < job.created_at)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
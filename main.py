@@ -1,19 +1,26 @@
 import shutil
 import os
+import json
 import asyncio
 from fastapi import FastAPI, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from starlette.responses import JSONResponse
-from pydantic import BaseModel, HttpUrl
-from typing import List, Optional
+from starlette.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field, HttpUrl
+from typing import List, Literal, Optional
 import uvicorn
 import random
+import threading
 import fix_suggestions_generator
-from qa_agent import execute_url_tests, execute_html_tests
+import site_generator
+import jobs
+from tests import browser_pool
+from qa_agent import execute_url_tests, execute_html_tests, stream_url_tests, stream_html_tests
+from crawler import execute_crawl_tests, MAX_DEPTH, MAX_PAGES, DEPTH_LIMIT, PAGES_LIMIT
 from buggy_code_generator import get_buggy_code_snippet
 
 app = FastAPI()
+job_manager = jobs.JobManager()
 
 # CORS middleware setup
 app.add_middleware(
@@ -25,16 +32,39 @@ app.add_middleware(
 )
 
 
+GeneratorEngine = Literal["gpt", "templates"]
+
+# Buggy website generation: 'gpt' asks the model for the snippets, 'templates' composes them offline from the bug families
+GENERATOR_ENGINE = os.environ.get("QA_GENERATOR", "gpt")
+
+
 class BugSelection(BaseModel):
     bugs: List[str]
+    engine: Optional[GeneratorEngine] = None
+    seed: Optional[int] = None
+
+
+TestMode = Literal["static", "full"]
+LoadProfile = Literal["full", "light"]
 
 
 class FilePath(BaseModel):
     file_path: str
+    mode: TestMode = "full"
+    profile: Optional[LoadProfile] = None
 
 
 class UrlData(BaseModel):
     url: HttpUrl
+    mode: TestMode = "full"
+    profile: Optional[LoadProfile] = None
+
+
+class CrawlData(BaseModel):
+    url: HttpUrl
+    max_depth: int = Field(MAX_DEPTH, ge=0, le=DEPTH_LIMIT)
+    max_pages: int = Field(MAX_PAGES, ge=1, le=PAGES_LIMIT)
+    profile: Optional[LoadProfile] = None
 
 
 class TestData(BaseModel):
@@ -44,33 +74,43 @@ class TestData(BaseModel):
     code_snippet: Optional[str]
 
 
+class ReportData(BaseModel):
+    results: dict
+
+
 @app.on_event("startup")
 async def startup_event():
     print("Application startup")
+    # Start the browsers in the background so the first test run does not pay the cold start
+    threading.Thread(target=browser_pool.get_browser_pool().warm_up, daemon=True).start()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     print("Application shutdown")
+    job_manager.shutdown()
+    browser_pool.close_browser_pool()
 
 
 @app.post("/generate")
 def generate_html(selection: BugSelection):
-    generated_html_snippets = get_buggy_code_snippet(selection.bugs)
-
-    template_files = ["./generated_html/website_template1.html", "./generated_html/website_template2.html"]
-    template_path = random.choice(template_files)
-    with open(template_path, "r") as template_file:
-        template_html = template_file.read()
+    response = {}
+    if (selection.engine or GENERATOR_ENGINE) == "templates":
+        # Offline and reproducible, the seed is returned so the same page can be generated again
+        site = site_generator.generate_site(selection.bugs, selection.seed)
+        updated_html = site["html"]
+        response["seed"] = site["seed"]
+    else:
+        generated_html_snippets = get_buggy_code_snippet(selection.bugs)
 
-    # Define the placeholder in the template where you want to insert the snippets
-    placeholder = "<!-- INSERT BUGGY CODE HERE -->"
+        template_file = random.choice(site_generator.TEMPLATE_FILES)
+        try:
+            template_html = site_generator.load_template(template_file)
+        except ValueError:
+            return {"error": "Placeholder not found in the template"}
 
-    # Insert the generated HTML snippets at the placeholder
-    if placeholder in template_html:
-        updated_html = template_html.replace(placeholder, generated_html_snippets)
-    else:
-        return {"error": "Placeholder not found in the template"}
+        # Insert the generated HTML snippets at the placeholder
+        updated_html = site_generator.fill_template(template_html, generated_html_snippets)
 
     # Save the updated HTML file
     file_name = "buggy_website.html"
@@ -78,26 +118,149 @@ def generate_html(selection: BugSelection):
     with open(file_path, "w") as file:
         file.write(updated_html)
 
-    return {"url": f"http://127.0.0.1:8000/generated_html/{file_name}"}
+    return {"url": f"http://127.0.0.1:8000/generated_html/{file_name}", **response}
 
 
 app.mount("/generated_html", StaticFiles(directory="generated_html"), name="generated_html")
 
 
+def queue_full_response(error):
+    return JSONResponse(status_code=429, content={"message": str(error)}, headers={"Retry-After": "30"})
+
+
 @app.post("/test_html")
-def test_html(file: FilePath):
+async def test_html(file: FilePath):
     file_path = file.file_path
-    results = execute_html_tests(file_path)
+    if file.mode == "static":
+        # No browser involved, the checks finish in milliseconds and skip the job queue
+        return await asyncio.to_thread(execute_html_tests, file_path, file.mode)
+    try:
+        job = job_manager.submit("test_html", execute_html_tests, file_path, file.mode, file.profile)
+    except jobs.JobQueueFullError as e:
+        return queue_full_response(e)
+    try:
+        results = await asyncio.wrap_future(job.future)
+    finally:
+        # The caller gets the results in the response, nobody polls this job
+        job_manager.discard(job)
     return results
 
 
 @app.post("/test_url")
-def test_url(url_data: UrlData):
+async def test_url(url_data: UrlData):
     url = str(url_data.url)
-    results = execute_url_tests(url)
+    if url_data.mode == "static":
+        results = await asyncio.to_thread(execute_url_tests, url, url_data.mode)
+        return {"results": results}
+    try:
+        job = job_manager.submit("test_url", execute_url_tests, url, url_data.mode, url_data.profile)
+    except jobs.JobQueueFullError as e:
+        return queue_full_response(e)
+    try:
+        results = await asyncio.wrap_future(job.future)
+    finally:
+        job_manager.discard(job)
     return {"results": results}
 
 
+@app.post("/jobs/test_html", status_code=202)
+def submit_html_job(file: FilePath):
+    try:
+        job = job_manager.submit("test_html", execute_html_tests, file.file_path, file.mode, file.profile)
+    except jobs.JobQueueFullError as e:
+        return queue_full_response(e)
+    return job.to_dict()
+
+
+@app.post("/jobs/test_url", status_code=202)
+def submit_url_job(url_data: UrlData):
+    try:
+        job = job_manager.submit("test_url", execute_url_tests, str(url_data.url), url_data.mode,
+                                 url_data.profile)
+    except jobs.JobQueueFullError as e:
+        return queue_full_response(e)
+    return job.to_dict()
+
+
+@app.post("/jobs/crawl", status_code=202)
+def submit_crawl_job(crawl_data: CrawlData):
+    try:
+        job = job_manager.submit("crawl", execute_crawl_tests, str(crawl_data.url),
+                                 crawl_data.max_depth, crawl_data.max_pages, crawl_data.profile)
+    except jobs.JobQueueFullError as e:
+        return queue_full_response(e)
+    return job.to_dict()
+
+
+@app.get("/jobs/{job_id}")
+def get_job_status(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"message": "Job not found"})
+    return {**job.to_dict(), "queue_position": job_manager.queue_position(job)}
+
+
+@app.get("/jobs/{job_id}/result")
+def get_job_result(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"message": "Job not found"})
+    if job.status == "failed":
+        return JSONResponse(status_code=500, content={"message": job.error, "job_id": job.id})
+    if not job.finished:
+        return JSONResponse(status_code=202, content=job.to_dict())
+    return {"job_id": job.id, "status": job.status, "results": job.result}
+
+
+async def server_sent_events(stream):
+    """
+    Formats streamed test results as server-sent events, one event per tested component.
+    Waiting for the next result does not hold a thread, the tests run on a job worker.
+    :param stream: EventStream of the run.
+    """
+    queue = stream.subscribe()
+    try:
+        while True:
+            event = await queue.get()
+            if event is None:
+                yield "event: done\ndata: {}\n\n"
+                return
+            kind, payload = event
+            if kind == "failed":
+                yield f"event: failed\ndata: {json.dumps({'message': payload})}\n\n"
+                return
+            family, item, item_results = payload
+            yield f"data: {json.dumps({'family': family, 'item': item, 'result': item_results})}\n\n"
+    finally:
+        # Stops the tests when the last client following them disconnected before the end
+        stream.unsubscribe(queue)
+
+
+def stream_submitter(mode):
+    """Full streamed runs go through the job queue like the other runs, static ones need no browser and start at once."""
+    if mode == "static":
+        return None
+    return job_manager.submit
+
+
+@app.get("/stream/test_html")
+def stream_test_html(file_path: str, mode: TestMode = "full", profile: Optional[LoadProfile] = None):
+    try:
+        stream = stream_html_tests(file_path, mode, profile, submit=stream_submitter(mode))
+    except jobs.JobQueueFullError as e:
+        return queue_full_response(e)
+    return StreamingResponse(server_sent_events(stream), media_type="text/event-stream")
+
+
+@app.get("/stream/test_url")
+def stream_test_url(url: HttpUrl, mode: TestMode = "full", profile: Optional[LoadProfile] = None):
+    try:
+        stream = stream_url_tests(str(url), mode, profile, submit=stream_submitter(mode))
+    except jobs.JobQueueFullError as e:
+        return queue_full_response(e)
+    return StreamingResponse(server_sent_events(stream), media_type="text/event-stream")
+
+
 @app.post("/upload")
 async def upload_file(file: UploadFile = File(...)):
     try:
@@ -126,6 +289,41 @@ def suggest_fix(test_data: TestData):
         return {"suggestion": "Error during suggestion generation"}
 
 
+def suggestion_events(tokens):
+    """
+    Formats a streamed fix suggestion as server-sent events, one event per piece of text.
+    :param tokens: Generator of text pieces.
+    """
+    try:
+        for token in tokens:
+            yield f"data: {json.dumps({'token': token})}\n\n"
+        yield "event: done\ndata: {}\n\n"
+    except Exception as e:
+        yield f"event: failed\ndata: {json.dumps({'message': str(e)})}\n\n"
+    finally:
+        # Stops the model when the client disconnected before the end
+        tokens.close()
+
+
+@app.post("/stream/suggest_fix")
+def stream_suggest_fix(test_data: TestData):
+    tokens = fix_suggestions_generator.stream_fix_suggestion(
+        test_data.category,
+        test_data.item,
+        test_data.test,
+        test_data.code_snippet
+    )
+    return StreamingResponse(suggestion_events(tokens), media_type="text/event-stream")
+
+
+@app.post("/suggest_fixes")
+def suggest_fixes(report_data: ReportData):
+    try:
+        return {"suggestions": fix_suggestions_generator.execute_fix_suggestions(report_data.results)}
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"message": str(e)})
+
+
 if __name__ == "__main__":
     try:
         uvicorn.run("main:app", host="127.0.0.1", port=8000, log_level="info")
@@ -1,35 +1,133 @@
 import tests.link_tests as link_tests
 import tests.button_tests as button_tests
+from functools import partial
 from urllib.parse import urlparse
-from tests import form_tests
+from tests import form_tests, static_tests
+from tests.page_session import PageSession
 from w3c_validator import validate
+from scheduler import family_failure, run_families, stream_families
+from result_cache import ResultCache, content_hash
+from single_flight import EventStream, SingleFlight, request_key
+from tests.link_cache import normalize_url
+import html_validator
+import os
+import requests
 
+# Validation engine: 'w3c' sends the document to the W3C service, 'local' checks it in-process
+VALIDATOR_ENGINE = os.environ.get("QA_VALIDATOR", "w3c")
 
-def run_tests_wrapper(web_data):
+# W3C reports of documents already validated, keyed by the hash of their content
+validation_cache = ResultCache("w3c_validation",
+                               memory_entries=int(os.environ.get("QA_VALIDATION_CACHE_ENTRIES", "128")),
+                               ttl=float(os.environ.get("QA_VALIDATION_CACHE_TTL", 7 * 24 * 3600)))
+
+# Test runs in progress and recently finished, shared by identical requests
+test_runs = SingleFlight()
+
+# Test modes: 'static' decides what it can from the markup without a browser, 'full' also renders and interacts
+TEST_MODES = ("static", "full")
+STATIC_FAMILIES = ("links", "buttons", "forms", "W3C Validation Report")
+
+
+def run_tests_wrapper(web_data, source=None, profile=None):
     """
     Wrapper function for running tests on buttons, links, and forms.
-    Writes the results into a single file.
+    The page is loaded once and the test families run concurrently on it.
     :param web_data: HTML code or URL.
+    :param source: File path or URL to run the W3C validation on.
+    :param profile: Browser load profile, see tests.load_profiles.
     """
-    is_url = web_data.startswith("http")
-    if is_url:
-        link_results = link_tests.execute_url_tests(web_data)
-        button_results = button_tests.execute_forms_url_tests(web_data)
-        form_results = form_tests.execute_forms_url_tests(web_data)
-    else:
-        link_results = link_tests.execute_html_tests(web_data)
-        button_results = button_tests.execute_forms_html_tests(web_data)
-        form_results = form_tests.execute_forms_html_tests(web_data)
+    with PageSession(web_data, source, profile) as session:
+        families = {
+            "links": partial(link_tests.execute_session_tests, session),
+            "buttons": partial(button_tests.execute_session_tests, session),
+            "forms": partial(form_tests.execute_session_tests, session)
+        }
+        if session.source:
+            families['W3C Validation Report'] = partial(validate_session_source, session)
+        unified_results = run_families(families, on_cancel=lambda timed_out: session.cancel())
+
+    return unified_results
+
+
+def stream_tests_wrapper(web_data, source=None, profile=None):
+    """
+    Runs the same tests as run_tests_wrapper but yields every component's results as soon as it is produced.
+    Closing the generator stops the tests still running.
+    :param web_data: HTML code or URL.
+    :param source: File path or URL to run the W3C validation on.
+    :param profile: Browser load profile, see tests.load_profiles.
+    :return: Generator of (family, item, results) tuples.
+    """
+    with PageSession(web_data, source, profile) as session:
+        families = {
+            "links": partial(link_tests.iter_session_tests, session),
+            "buttons": partial(button_tests.iter_session_tests, session),
+            "forms": partial(form_tests.iter_session_tests, session)
+        }
+        if session.source:
+            families['W3C Validation Report'] = partial(validate_session_source, session)
+        yield from stream_families(families, on_cancel=lambda cancelled: session.cancel())
 
-    unified_results = {
-        "links": link_results,
-        "buttons": button_results,
-        "forms": form_results
-    }
 
+def run_static_tests(web_data, source=None, profile=None):
+    """
+    Runs the markup-only checks and the offline conformance check, without starting a browser.
+    :param web_data: HTML code or URL.
+    :param source: File path or URL the HTML code came from.
+    :param profile: Unused, no browser is started.
+    :return: Test results, with the same families as run_tests_wrapper.
+    """
+    if web_data.startswith("http"):
+        try:
+            html_content, base_url = fetch_document(web_data), web_data
+        except requests.RequestException as e:
+            # An unreachable page or an error status is reported by every family, not tested as the target
+            return {family: family_failure(family, f"Exception: {str(e)}") for family in STATIC_FAMILIES}
+    else:
+        html_content, base_url = web_data, None
+    unified_results = static_tests.execute_static_tests(html_content, base_url)
+    unified_results['W3C Validation Report'] = validate_html_or_url(source or web_data, html_content, engine="local")
     return unified_results
 
 
+def iter_static_tests(web_data, source=None, profile=None):
+    """
+    Yields the static results in the same (family, item, results) form as stream_tests_wrapper.
+    """
+    for family, family_results in run_static_tests(web_data, source).items():
+        for item, results in family_results.items():
+            yield family, item, results
+
+
+def fetch_document(url):
+    """
+    Downloads a document as served, without rendering it.
+    :param url: URL of the document.
+    :return: Document text, requests.RequestException is raised when it can't be fetched or the status is an error.
+    """
+    response = link_tests.get_http_session().get(url, timeout=link_tests.REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response.text
+
+
+def validate_session_source(session):
+    """
+    Validates the document of a PageSession.
+    The page source of a URL is the browser's re-serialized DOM, with the markup errors already repaired and other
+    line numbers, so the served document is downloaded and validated instead.
+    :param session: PageSession with a source.
+    :return: Validated Test Results.
+    """
+    content = session.html
+    if session.source.startswith("http"):
+        try:
+            content = fetch_document(session.source)
+        except requests.RequestException:
+            content = None  # Left to the validator, which fetches the URL itself
+    return validate_html_or_url(session.source, content)
+
+
 def get_html_content(file_path):
     """
     Reads an HTML file from the given path and returns its content.
@@ -57,41 +155,106 @@ def get_domain_from_url(url):
     return domain
 
 
-def execute_html_tests(file_path):
+def execute_html_tests(file_path, mode="full", profile=None):
     """
     Runs the tests on the given HTML file and returns the results filepath.
     :param file_path: Path to the HTML file.
+    :param mode: 'static' for the browser-free checks only, 'full' for every test.
+    :param profile: Browser load profile of full runs, see tests.load_profiles.
     :return: Path to the results file.
     """
-    validate_html_or_url(file_path)
     html_content = get_html_content(file_path)
     unified_results = None
     if html_content:
-        unified_results = run_tests_wrapper(html_content)
-        unified_results['W3C Validation Report'] = validate_html_or_url(file_path)
+        # Identical concurrent runs of the same content share one execution
+        key = request_key("html", content_hash(html_content), mode=mode, profile=profile)
+        runner = run_static_tests if mode == "static" else run_tests_wrapper
+        unified_results = test_runs.do(key, runner, html_content, file_path, profile)
     return unified_results
 
 
-def execute_url_tests(url):
+def execute_url_tests(url, mode="full", profile=None):
     """
     Runs the tests on the given URL and returns the results filepath.
     :param url: URL to run the tests on.
+    :param mode: 'static' for the browser-free checks only, 'full' for every test.
+    :param profile: Browser load profile of full runs, see tests.load_profiles.
     :return: Path to the results file.
     """
-    results = run_tests_wrapper(url)
+    # Identical concurrent runs of the same URL share one execution
+    key = request_key("url", normalize_url(url), mode=mode, profile=profile)
+    runner = run_static_tests if mode == "static" else run_tests_wrapper
+    results = test_runs.do(key, runner, url, None, profile)
+    return results
 
-    results['W3C Validation Report'] = validate_html_or_url(url)
 
-    return results
+def stream_html_tests(file_path, mode="full", profile=None, submit=None):
+    """
+    Starts or joins the streamed test run of the given HTML file.
+    Identical runs share the key of execute_html_tests, recent results of a finished run are replayed.
+    :param file_path: Path to the HTML file.
+    :param mode: 'static' for the browser-free checks only, 'full' for every test.
+    :param profile: Browser load profile of full runs, see tests.load_profiles.
+    :param submit: Callable(kind, function, *args) running the run in the background, e.g. JobManager.submit.
+                   It may raise to refuse the run. Runs in the calling thread when None.
+    :return: EventStream of the run, empty if the file could not be read.
+    """
+    html_content = get_html_content(file_path)
+    if not html_content:
+        stream = EventStream()
+        stream.finish()
+        return stream
+    key = request_key("html", content_hash(html_content), mode=mode, profile=profile)
+    streamer = iter_static_tests if mode == "static" else stream_tests_wrapper
+    return test_runs.stream(key, partial(start_stream, submit, "stream_html", streamer, html_content, file_path,
+                                         profile))
 
 
-def validate_html_or_url(url_or_file):
+def stream_url_tests(url, mode="full", profile=None, submit=None):
+    """
+    Starts or joins the streamed test run of the given URL.
+    Identical runs share the key of execute_url_tests, recent results of a finished run are replayed.
+    :param url: URL to run the tests on.
+    :param mode: 'static' for the browser-free checks only, 'full' for every test.
+    :param profile: Browser load profile of full runs, see tests.load_profiles.
+    :param submit: Callable(kind, function, *args) running the run in the background, e.g. JobManager.submit.
+                   It may raise to refuse the run. Runs in the calling thread when None.
+    :return: EventStream of the run.
+    """
+    key = request_key("url", normalize_url(url), mode=mode, profile=profile)
+    streamer = iter_static_tests if mode == "static" else stream_tests_wrapper
+    return test_runs.stream(key, partial(start_stream, submit, "stream_url", streamer, url, None, profile))
+
+
+def start_stream(submit, kind, streamer, web_data, source, profile, stream):
+    """Runs a streamer into an EventStream with the given submit callable."""
+    events = streamer(web_data, source, profile)
+    if submit is None:
+        stream.run(events)
+    else:
+        submit(kind, stream.run, events)
+
+
+def validate_html_or_url(url_or_file, content=None, engine=None):
     """"
     Validate the HTML content from a URL or file
+    Reports are cached by the hash of the document content when it is given.
     :param url_or_file: URL or file to validate.
+    :param content: Content of the document, used as the cache key.
+    :param engine: 'w3c' for the remote W3C validator or 'local' for the offline checker, defaults to VALIDATOR_ENGINE.
     :return: Validated Test Results."""
+    engine = engine or VALIDATOR_ENGINE
+    cache_key = content_hash(engine, content) if content is not None else None
+    if cache_key:
+        cached = validation_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
     results = {}
-    result = validate(url_or_file)
+    if engine == "local":
+        result = html_validator.validate(url_or_file, content)
+    else:
+        result = validate(url_or_file)
     for i in result['messages']:
         message_type = i['type']
 
@@ -99,4 +262,7 @@ def validate_html_or_url(url_or_file):
         desc = f"{message_type} in Line {i['lastLine']}"
         results[desc] = {"message": f"failed - {i['message']}",
                          "code_snippet": i['extract'].strip()}
+
+    if cache_key:
+        validation_cache.put(cache_key, results)
     return results
@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Directory of the on-disk stores, an empty value keeps the caches in memory only
+CACHE_DIR = os.environ.get("QA_CACHE_DIR", "qa_cache")
+BUSY_TIMEOUT = 10  # Seconds to wait for another process holding the SQLite lock
+
+
+def content_hash(*parts):
+    """
+    Hashes the given values into a stable cache key.
+    :param parts: Strings or bytes, None values are hashed as empty.
+    :return: Hex SHA-256 digest.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if part is None:
+            part = b""
+        elif isinstance(part, str):
+            part = part.encode("utf-8")
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Two level cache of JSON serializable results: a bounded in-memory LRU in front of a bounded SQLite store.
+    Entries older than the TTL are ignored and the least recently used ones are evicted first.
+    """
+
+    def __init__(self, name, memory_entries=256, disk_entries=10000, ttl=None, directory=CACHE_DIR):
+        """
+        :param name: Cache name, also the name of its SQLite file.
+        :param memory_entries: Maximum number of entries kept in memory.
+        :param disk_entries: Maximum number of entries kept on disk.
+        :param ttl: Seconds an entry stays valid, None keeps entries until they are evicted.
+        :param directory: Directory of the SQLite file, empty to disable the on-disk store.
+        """
+        self.name = name
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.ttl = ttl
+        self.path = os.path.join(directory, f"{name}.sqlite3") if directory else None
+        self._memory = OrderedDict()
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, value TEXT, created_at REAL, accessed_at REAL)"
+            )
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def _is_expired(self, created_at):
+        return self.ttl is not None and time.time() - created_at >= self.ttl
+
+    def _remember(self, key, value, created_at):
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """
+        :param key: Cache key.
+        :return: Cached value, or None when the key is missing or expired.
+        """
+        with self._lock:
+            if key in self._memory:
+                value, created_at = self._memory[key]
+                if not self._is_expired(created_at):
+                    self._memory.move_to_end(key)
+                    return value
+                del self._memory[key]
+            if not self.path:
+                return None
+            try:
+                connection = self._connect()
+                row = connection.execute("SELECT value, created_at FROM results WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                if self._is_expired(row[1]):
+                    connection.execute("DELETE FROM results WHERE key = ?", (key,))
+                    connection.commit()
+                    return None
+                connection.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (time.time(), key))
+                connection.commit()
+            except sqlite3.Error:
+                # A store locked or broken by another process is a miss, the result is computed again
+                return None
+            value = json.loads(row[0])
+            self._remember(key, value, row[1])
+            return value
+
+    def put(self, key, value):
+        """
+        Stores a value, evicting the least recently used entries beyond the size limits.
+        SQLite errors are ignored, the cache only saves work.
+        :param key: Cache key.
+        :param value: JSON serializable value.
+        """
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            if not self.path:
+                return
+            try:
+                connection = self._connect()
+                connection.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                                   (key, json.dumps(value), now, now))
+                connection.execute(
+                    "DELETE FROM results WHERE key IN ("
+                    "SELECT key FROM results ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.disk_entries,)
+                )
+                connection.commit()
+            except sqlite3.Error:
+                # The value stays in memory, only the on-disk copy is lost
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self.path:
+                connection = self._connect()
+                connection.execute("DELETE FROM results")
+                connection.commit()
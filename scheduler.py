@@ -0,0 +1,106 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Per-family time limits in seconds
+DEFAULT_TIMEOUT = float(os.environ.get("QA_FAMILY_TIMEOUT", "300"))
+FAMILY_TIMEOUTS = {
+    "links": float(os.environ.get("QA_LINKS_FAMILY_TIMEOUT", DEFAULT_TIMEOUT)),
+    "buttons": float(os.environ.get("QA_BUTTONS_FAMILY_TIMEOUT", DEFAULT_TIMEOUT)),
+    "forms": float(os.environ.get("QA_FORMS_FAMILY_TIMEOUT", DEFAULT_TIMEOUT)),
+    "W3C Validation Report": float(os.environ.get("QA_W3C_FAMILY_TIMEOUT", DEFAULT_TIMEOUT)),
+}
+
+_FAMILY_DONE = object()
+
+
+def family_failure(family, message):
+    """
+    Builds a family result reporting that the family could not be tested,
+    in the same item -> test -> result shape as regular results.
+    """
+    return {
+        f"{family} tests": {
+            "Execution": f"failed - {message}",
+            "code_snippet": ""
+        }
+    }
+
+
+def stream_families(families, timeouts=None, on_cancel=None):
+    """
+    Runs the test families concurrently, each under its own timeout, and yields their results as they are produced.
+    :param families: Dictionary mapping a family name to a callable returning its results,
+                     either a dictionary or an iterable of (item, result) pairs.
+    :param timeouts: Optional dictionary overriding the timeout of some families.
+    :param on_cancel: Callback receiving the names of the families that timed out or were abandoned
+                      by the consumer, used to stop their work.
+    :return: Generator of (family, item, result) tuples.
+    """
+    timeouts = {**FAMILY_TIMEOUTS, **(timeouts or {})}
+    events = queue.Queue()
+    stopped = threading.Event()
+
+    def run(name, family):
+        try:
+            produced = family()
+            for item, result in (produced.items() if isinstance(produced, dict) else produced):
+                if stopped.is_set():
+                    return
+                events.put((name, item, result))
+        except Exception as e:
+            for item, result in family_failure(name, f"Exception: {str(e)}").items():
+                events.put((name, item, result))
+        finally:
+            events.put((name, _FAMILY_DONE, None))
+
+    executor = ThreadPoolExecutor(max_workers=max(len(families), 1), thread_name_prefix="qa-family")
+    for name, family in families.items():
+        executor.submit(run, name, family)
+    start = time.monotonic()
+    pending = set(families)
+    timed_out = []
+    try:
+        while pending:
+            deadline = min(timeouts.get(name, DEFAULT_TIMEOUT) for name in pending)
+            try:
+                name, item, result = events.get(timeout=max(0.0, deadline - (time.monotonic() - start)))
+            except queue.Empty:
+                elapsed = time.monotonic() - start
+                for name in [name for name in families if name in pending]:
+                    timeout = timeouts.get(name, DEFAULT_TIMEOUT)
+                    if timeout <= elapsed:
+                        pending.discard(name)
+                        timed_out.append(name)
+                        for item, result in family_failure(
+                                name, f"Tests did not finish within {timeout:g} seconds").items():
+                            yield name, item, result
+                continue
+            if name not in pending:
+                continue  # Late results of a family that already timed out
+            if item is _FAMILY_DONE:
+                pending.discard(name)
+            else:
+                yield name, item, result
+    finally:
+        stopped.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+        cancelled = timed_out + sorted(pending)
+        if cancelled and on_cancel:
+            on_cancel(cancelled)
+
+
+def run_families(families, timeouts=None, on_cancel=None):
+    """
+    Runs the test families concurrently, each under its own timeout.
+    :param families: Dictionary mapping a family name to a callable returning its results.
+    :param timeouts: Optional dictionary overriding the timeout of some families.
+    :param on_cancel: Callback receiving the names of the timed out families, used to stop their work.
+    :return: Dictionary mapping each family name to its results, in the order of families.
+    """
+    results = {name: {} for name in families}
+    for name, item, result in stream_families(families, timeouts, on_cancel):
+        results[name][item] = result
+    return results
@@ -0,0 +1,207 @@
+import asyncio
+import json
+import os
+import threading
+from concurrent.futures import Future
+
+from result_cache import ResultCache, content_hash
+
+# Seconds a finished run's results are reused by identical requests
+RESULT_TTL = float(os.environ.get("QA_RESULT_TTL", "60"))
+
+
+def request_key(kind, target, **options):
+    """
+    Builds the key identifying identical test requests.
+    :param kind: Request type, e.g. 'url' or 'html'.
+    :param target: Normalized URL or hash of the tested content.
+    :param options: Test options that change the results.
+    :return: Hex digest.
+    """
+    return content_hash(kind, target, json.dumps(options, sort_keys=True))
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent identical calls: the first caller runs the function and the others wait for its result.
+    Results are then kept in memory for a short time to absorb bursts of repeated requests.
+    """
+
+    def __init__(self, result_ttl=RESULT_TTL):
+        self._in_flight = {}
+        self._streams = {}
+        self._lock = threading.Lock()
+        self._results = ResultCache("single_flight", memory_entries=64, ttl=result_ttl, directory="")
+
+    def do(self, key, function, *args):
+        """
+        :param key: Key identifying identical calls.
+        :param function: Callable to run.
+        :param args: Arguments passed to the callable.
+        :return: Result of the callable, shared by all the callers with the same key.
+        """
+        with self._lock:
+            result = self._results.get(key)
+            if result is not None:
+                return result
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+        if not leader:
+            return future.result()
+
+        try:
+            result = function(*args)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            if result is not None:
+                self._results.put(key, result)
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def stream(self, key, start):
+        """
+        Shares a streamed run between identical requests, like do() for streamed results.
+        A run streamed for the same key is joined, recently finished results of the key are replayed.
+        :param key: Key identifying identical calls.
+        :param start: Callable taking the new EventStream and starting its run in the background.
+                      Its exceptions, e.g. a full job queue, propagate and no stream is registered.
+        :return: EventStream of the run.
+        """
+        with self._lock:
+            stream = self._streams.get(key)
+            if stream is not None and not stream.cancelled.is_set():
+                return stream
+            results = self._results.get(key)
+            if results is not None:
+                return EventStream.replay(results)
+            stream = EventStream(on_finish=lambda: self._finish_stream(key, stream))
+            self._streams[key] = stream
+        try:
+            start(stream)
+        except BaseException:
+            self._forget_stream(key, stream)
+            raise
+        return stream
+
+    def _forget_stream(self, key, stream):
+        with self._lock:
+            if self._streams.get(key) is stream:
+                del self._streams[key]
+
+    def _finish_stream(self, key, stream):
+        """Keeps the results of a completed stream for do() and later streams, then forgets the stream."""
+        with self._lock:
+            if stream.completed:
+                self._results.put(key, stream.results())
+            if self._streams.get(key) is stream:
+                del self._streams[key]
+
+
+class EventStream:
+    """
+    Events of a run produced by a worker thread and replayed from the start to every subscriber.
+    Subscribers read asyncio queues, so waiting for the next event does not hold a thread.
+    The run is cancelled once its last subscriber left.
+    Events are ('result', (family, item, results)) and ('failed', message) tuples, None ends the stream.
+    """
+
+    def __init__(self, on_finish=None):
+        self.cancelled = threading.Event()
+        self.completed = False  # Every result was published, the run was neither cancelled nor failed
+        self._events = []
+        self._finished = False
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._on_finish = on_finish
+
+    @classmethod
+    def replay(cls, results):
+        """
+        :param results: Results of a finished run, {family: {item: results}}.
+        :return: Finished EventStream with one event per component.
+        """
+        stream = cls()
+        for family, family_results in results.items():
+            for item, item_results in family_results.items():
+                stream.publish(("result", (family, item, item_results)))
+        stream.finish()
+        return stream
+
+    def results(self):
+        """
+        :return: Results published so far, {family: {item: results}} like the results of a run that is not streamed.
+        """
+        results = {}
+        with self._lock:
+            events = list(self._events)
+        for event in events:
+            if event is not None and event[0] == "result":
+                family, item, item_results = event[1]
+                results.setdefault(family, {})[item] = item_results
+        return results
+
+    def publish(self, event):
+        with self._lock:
+            self._events.append(event)
+            subscribers = list(self._subscribers.items())
+        for queue, loop in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                pass  # The subscriber's event loop is closed
+
+    def finish(self):
+        with self._lock:
+            if self._finished:
+                return
+            self._finished = True
+        self.publish(None)
+        if self._on_finish:
+            self._on_finish()
+
+    def run(self, events):
+        """
+        Publishes the results of a run, called by the worker running it.
+        :param events: Generator of (family, item, results) tuples, closed early when the stream is cancelled.
+        """
+        try:
+            # A run queued behind other jobs may have been abandoned before it started
+            while not self.cancelled.is_set():
+                event = next(events, None)
+                if event is None:
+                    self.completed = True
+                    break
+                self.publish(("result", event))
+        except Exception as e:
+            self.publish(("failed", str(e)))
+        finally:
+            events.close()
+            self.finish()
+
+    def subscribe(self):
+        """
+        Called from the event loop of the subscriber.
+        :return: asyncio.Queue receiving every event of the run, from the first one.
+        """
+        queue = asyncio.Queue()
+        with self._lock:
+            for event in self._events:
+                queue.put_nowait(event)
+            self._subscribers[queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self._subscribers.pop(queue, None)
+            abandoned = not self._subscribers and not self._finished
+        if abandoned:
+            # Nobody reads the results anymore, the worker stops the tests at the next component
+            self.cancelled.set()
@@ -0,0 +1,212 @@
+import os
+import random
+import re
+from functools import lru_cache
+
+from system.bug_families.button_bugs import button_bugs
+from system.bug_families.form_bugs import forms_bugs
+from system.bug_families.link_bugs import link_bugs
+from system.bug_families.tab_bugs import tab_bugs
+
+TEMPLATE_DIR = "generated_html"
+TEMPLATE_FILES = ["website_template1.html", "website_template2.html"]
+PLACEHOLDER = "<!-- INSERT BUGGY CODE HERE -->"
+
+# Bug name, as selected on the generator page, to the family it tests and its buggy snippets
+BUG_FAMILIES = {
+    **{bug: ("buttons", snippets) for bug, snippets in button_bugs.items()},
+    **{bug: ("links", snippets) for bug, snippets in link_bugs.items()},
+    **{bug: ("forms", snippets) for bug, snippets in forms_bugs.items()},
+    **{bug: ("links", snippets) for bug, snippets in tab_bugs.items()},
+}
+
+# Styling choices of a generated page, they only change how the snippets look, never whether they are visible
+PALETTES = [
+    {"background": "#fdf6e3", "border": "#b58900", "text": "#3b3b3b", "accent": "#cb4b16"},
+    {"background": "#eef6ff", "border": "#1e6fd9", "text": "#1b2a41", "accent": "#0b5394"},
+    {"background": "#f3fbf4", "border": "#2e8b57", "text": "#20322a", "accent": "#1d6b40"},
+    {"background": "#fff0f3", "border": "#c2185b", "text": "#3d1f2a", "accent": "#ad1457"},
+    {"background": "#f5f3ff", "border": "#6a4fc9", "text": "#2a2440", "accent": "#4b32a8"},
+    {"background": "#f7f7f7", "border": "#555555", "text": "#222222", "accent": "#0077aa"},
+]
+FONTS = ["Arial, sans-serif", "Georgia, serif", "'Trebuchet MS', sans-serif", "Verdana, sans-serif",
+         "'Courier New', monospace", "Tahoma, sans-serif"]
+BORDER_STYLES = ["solid", "dashed", "dotted", "double"]
+RADII = [0, 4, 8, 12, 16]
+PADDINGS = [8, 12, 16, 20, 24]
+SHADOWS = ["none", "0 1px 3px rgba(0, 0, 0, 0.2)", "0 4px 12px rgba(0, 0, 0, 0.15)"]
+
+# Working components mixed with the buggy ones on larger pages, {n} is the component number
+CLEAN_SNIPPETS = {
+    "links": [
+        '<a href="#qa-component-{n}">Section {n}</a>',
+        '<a href="mailto:contact{n}@example.com">Contact {n}</a>',
+    ],
+    "buttons": [
+        '<button type="button" onclick="this.textContent = \'Clicked {n}\'">Action {n}</button>',
+        '<input type="button" value="Option {n}" onclick="this.value = \'Selected {n}\'">',
+    ],
+    "forms": [
+        """<form id="form-{n}" onsubmit="return false;">
+<label for="name-{n}">Name:</label>
+<input type="text" id="name-{n}" name="name">
+<label for="email-{n}">Email:</label>
+<input type="email" id="email-{n}" name="email">
+<input type="submit" value="Send">
+</form>""",
+    ],
+}
+
+# id and label for attributes, suffixed per insertion so that a bug repeated on a page keeps unique ids
+ID_ATTRIBUTE = re.compile(r'\b(id|for)="([^"]*)"')
+
+# Bug names of each family, in a fixed order so that a seed always picks the same bugs
+FAMILY_BUGS = {family: [bug for bug, (bug_family, _) in BUG_FAMILIES.items() if bug_family == family]
+               for family in CLEAN_SNIPPETS}
+
+
+@lru_cache(maxsize=None)
+def load_template(template_file):
+    """
+    :param template_file: File name in TEMPLATE_DIR.
+    :return: Template HTML, read from disk once per process.
+    """
+    with open(os.path.join(TEMPLATE_DIR, template_file), "r", encoding="utf-8") as file:
+        template_html = file.read()
+    if PLACEHOLDER not in template_html:
+        raise ValueError(f"Placeholder not found in the template {template_file}")
+    return template_html
+
+
+def bug_class(bug):
+    """Class name of the div holding a bug's snippet, e.g. 'bug-drop-down-list-selection-validation'."""
+    return "bug-" + re.sub(r"[^a-z0-9]+", "-", bug.lower()).strip("-")
+
+
+def generate_style(rng, classes):
+    """
+    :param rng: random.Random instance.
+    :param classes: Class names of the bug divs of the page.
+    :return: <style> element giving every bug div its own look.
+    """
+    rules = []
+    for class_name in classes:
+        palette = rng.choice(PALETTES)
+        rules.append(
+            f".{class_name} {{ background: {palette['background']}; color: {palette['text']}; "
+            f"border: 2px {rng.choice(BORDER_STYLES)} {palette['border']}; border-radius: {rng.choice(RADII)}px; "
+            f"padding: {rng.choice(PADDINGS)}px; margin: {rng.choice(PADDINGS)}px 0; "
+            f"font-family: {rng.choice(FONTS)}; box-shadow: {rng.choice(SHADOWS)}; }}\n"
+            f".{class_name} a, .{class_name} button {{ color: {palette['accent']}; }}"
+        )
+    return "<style>\n" + "\n".join(rules) + "\n</style>"
+
+
+def suffix_ids(snippet, suffix):
+    """
+    :param snippet: HTML code.
+    :param suffix: Suffix appended to every id and label for value, e.g. the number of the insertion.
+    :return: (HTML code with the suffixed ids, list of its ids) tuple.
+    """
+    snippet = ID_ATTRIBUTE.sub(lambda match: f'{match.group(1)}="{match.group(2)}-{suffix}"', snippet)
+    return snippet, [value for attribute, value in ID_ATTRIBUTE.findall(snippet) if attribute == "id"]
+
+
+def pick_bug(bug, rng, n):
+    """
+    :param bug: Bug name, see BUG_FAMILIES.
+    :param rng: random.Random instance.
+    :param n: Number of the insertion on the page, suffixed to the ids of the snippet.
+    :return: Manifest entry of one of the bug's snippets, {bug, family, variant, class, snippet, ids}, with the snippet
+             and the ids as inserted in the page.
+    """
+    family, snippets = BUG_FAMILIES[bug]
+    variant = rng.randrange(len(snippets))
+    snippet, ids = suffix_ids(snippets[variant].strip(), n)
+    return {"bug": bug, "family": family, "variant": variant, "class": bug_class(bug), "snippet": snippet, "ids": ids}
+
+
+def generate_buggy_code(bugs, rng):
+    """
+    Composes the buggy snippets of the selected bugs, one div per bug, without any network call.
+    :param bugs: Bug names, see BUG_FAMILIES. Unknown names are skipped.
+    :param rng: random.Random instance picking the snippet variants and the styling.
+    :return: (HTML code, list of {bug, family, variant, class, snippet, ids} dictionaries of the injected bugs) tuple.
+    """
+    blocks = []
+    manifest = []
+    for bug in bugs:
+        if bug not in BUG_FAMILIES:
+            continue
+        entry = pick_bug(bug, rng, len(manifest) + 1)
+        blocks.append(f'<div class="{entry["class"]}">\n{entry["snippet"]}\n</div>')
+        manifest.append(entry)
+    style = generate_style(rng, list(dict.fromkeys(entry["class"] for entry in manifest)))
+    return style + "\n" + "\n".join(blocks), manifest
+
+
+def fill_template(template_html, buggy_code):
+    """Inserts the buggy code at the placeholder of a website template."""
+    return template_html.replace(PLACEHOLDER, buggy_code)
+
+
+def generate_site(bugs, seed=None, template_file=None):
+    """
+    Builds a buggy website from the bug families and the website templates.
+    The same bugs and seed always give the same page.
+    :param bugs: Bug names, see BUG_FAMILIES.
+    :param seed: Seed of the random choices, a random one is drawn when None.
+    :param template_file: Template in TEMPLATE_DIR, picked from TEMPLATE_FILES with the seed when None.
+    :return: Dictionary with the page 'html', the 'seed', the 'template' and the injected 'bugs'.
+    """
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    rng = random.Random(seed)
+    template_file = template_file or rng.choice(TEMPLATE_FILES)
+    buggy_code, manifest = generate_buggy_code(bugs, rng)
+    return {
+        "html": fill_template(load_template(template_file), buggy_code),
+        "seed": seed,
+        "template": template_file,
+        "bugs": manifest,
+    }
+
+
+def generate_page(seed, links=10, forms=2, buttons=5, bug_rate=0.3, template_file=None):
+    """
+    Builds a buggy website of a given size, mixing buggy and working components of every family.
+    The same arguments always give the same page.
+    :param seed: Seed of the random choices.
+    :param links: Number of link components.
+    :param forms: Number of form components.
+    :param buttons: Number of button components.
+    :param bug_rate: Probability of each component to be a buggy snippet from the bug families.
+    :param template_file: Template in TEMPLATE_DIR, picked from TEMPLATE_FILES with the seed when None.
+    :return: Same dictionary as generate_site, every injected bug also has the 'id' of its div.
+    """
+    rng = random.Random(seed)
+    template_file = template_file or rng.choice(TEMPLATE_FILES)
+    families = ["links"] * links + ["forms"] * forms + ["buttons"] * buttons
+    rng.shuffle(families)
+
+    blocks = []
+    manifest = []
+    for n, family in enumerate(families, start=1):
+        component_id = f"qa-component-{n}"
+        if rng.random() < bug_rate:
+            entry = pick_bug(rng.choice(FAMILY_BUGS[family]), rng, n)
+            entry["id"] = component_id
+            manifest.append(entry)
+            blocks.append(f'<div id="{component_id}" class="{entry["class"]}">\n{entry["snippet"]}\n</div>')
+        else:
+            snippet = rng.choice(CLEAN_SNIPPETS[family]).format(n=n)
+            blocks.append(f'<div id="{component_id}" class="qa-{family}">\n{snippet}\n</div>')
+
+    classes = [f"qa-{family}" for family in CLEAN_SNIPPETS] + list(dict.fromkeys(entry["class"] for entry in manifest))
+    buggy_code = generate_style(rng, classes) + "\n" + "\n".join(blocks)
+    return {
+        "html": fill_template(load_template(template_file), buggy_code),
+        "seed": seed,
+        "template": template_file,
+        "bugs": manifest,
+    }
@@ -23,7 +23,6 @@ export default function Home() {
     const [selectedBugs, setSelectedBugs] = useState([]);
     const [generatedUrl, setGeneratedUrl] = useState('');
     const [inputUrl, setInputUrl] = useState('');
-    const [loading, setLoading] = useState(false); // Loading state
     const [file, setFile] = useState(null); // File state
     const [fileLocation, setFileLocation] = useState(''); // File location state
     const fileInputRef = useRef(null); // Reference to the hidden file input
@@ -115,58 +114,27 @@ export default function Home() {
         }
     };
 
-    const openResultsPage = (content) => {
-        sessionStorage.setItem('testResults', JSON.stringify(content));
+    // Opens the results page, which streams the results of each component as soon as it was tested
+    const openStreamingResultsPage = (endpoint, params) => {
+        sessionStorage.removeItem('testResults');
+        sessionStorage.setItem('testStream', JSON.stringify({endpoint, params}));
         router.push('/results');
     };
 
-    const handleTestHTML = async () => {
+    const handleTestHTML = () => {
         const htmlFilePath = (fileLocation === '') ? 'generated_html/buggy_website.html' : fileLocation; // Use the dynamically set file path
         if (htmlFilePath) {
-            try {
-                setLoading(true); // Set loading state
-                const response = await axios.post('http://127.0.0.1:8000/test_html', {
-                    file_path: htmlFilePath,
-                });
-                setLoading(false); // Reset loading state
-                if (response.data.error) {
-                    openResultsPage({error: response.data.error});
-                } else {
-                    openResultsPage(response.data); // Display the test results
-                }
-
-                reportButtonClick('testHTML', htmlButtonText);
-
-            } catch (error) {
-                setLoading(false); // Reset loading state
-                console.error('Failed to fetch results:', error);
-                openResultsPage({error: error.response ? error.response.data.detail : ''});
-            }
+            openStreamingResultsPage('test_html', {file_path: htmlFilePath});
+            reportButtonClick('testHTML', htmlButtonText);
         } else {
             alert('No HTML file generated yet.');
         }
     };
 
-    const handleTestURL = async () => {
+    const handleTestURL = () => {
         if (inputUrl) {
-            try {
-                setLoading(true); // Set loading state
-                const response = await axios.post('http://127.0.0.1:8000/test_url', {
-                    url: inputUrl, // This key needs to match your FastAPI model
-                });
-                setLoading(false); // Reset loading state
-                if (response.data.error) {
-                    openResultsPage({error: response.data.error});
-                } else {
-                    openResultsPage(response.data.results); // Display the test results
-                }
-
-                reportButtonClick('testURL', 'Test URL');
-            } catch (error) {
-                setLoading(false); // Reset loading state
-                console.error('Failed to fetch results:', error);
-                openResultsPage({error: error.response ? error.response.data.detail : ''});
-            }
+            openStreamingResultsPage('test_url', {url: inputUrl});
+            reportButtonClick('testURL', 'Test URL');
         } else {
             alert('Please enter a URL.');
         }
@@ -203,63 +171,55 @@ export default function Home() {
 
     return (
         <div>
-            {loading ? (
-                <div className={styles.loadingContainer}>
-                    <img src="/loading.gif" alt="Loading..." className={styles.loadingGif}/>
+            <h1 className={styles.title}>Bug Hunter</h1>
+            <p className={styles.subtitle}>Your Ultimate Bug Detection Tool</p>
+            <form onSubmit={handleSubmit} className={styles.form}>
+                <div className={styles.inputGroup}>
+                    <label htmlFor="urlInput" className={styles.inputLabel}>Enter URL (optional):</label>
+                    <input
+                        type="text"
+                        id="urlInput"
+                        value={inputUrl}
+                        onChange={handleInputChange}
+                        placeholder="Enter URL if you want to use an existing webpage"
+                        className={styles.input}
+                    />
+                </div>
+                <div id="menuButtons" className={styles.menuButtons}>
+                    <button className={styles.button} type="button" onClick={expandAll}>Expand All</button>
+                    <button className={styles.button} type="button" onClick={minimizeAll}>Minimize All</button>
+                </div>
+                <ButtonBugs handleCheckboxChange={handleCheckboxChange} toggleSection={toggleSection}/>
+                <TabBugs handleCheckboxChange={handleCheckboxChange} toggleSection={toggleSection}/>
+                <LinkBugs handleCheckboxChange={handleCheckboxChange} toggleSection={toggleSection}/>
+                <FormBugs handleCheckboxChange={handleCheckboxChange} toggleSection={toggleSection}/>
+                <button type="submit" className={styles.button}>Generate HTML</button>
+            </form>
+            {generatedUrl && (
+                <div className={styles.generatedHTML}>
+                    <a href={generatedUrl} id="generatedUrl" target="_blank"
+                       rel="noopener noreferrer">Click Here For Preview Generated HTML</a>
                 </div>
-            ) : (
-                <>
-                    <h1 className={styles.title}>Bug Hunter</h1>
-                    <p className={styles.subtitle}>Your Ultimate Bug Detection Tool</p>
-                    <form onSubmit={handleSubmit} className={styles.form}>
-                        <div className={styles.inputGroup}>
-                            <label htmlFor="urlInput" className={styles.inputLabel}>Enter URL (optional):</label>
-                            <input
-                                type="text"
-                                id="urlInput"
-                                value={inputUrl}
-                                onChange={handleInputChange}
-                                placeholder="Enter URL if you want to use an existing webpage"
-                                className={styles.input}
-                            />
-                        </div>
-                        <div id="menuButtons" className={styles.menuButtons}>
-                            <button className={styles.button} type="button" onClick={expandAll}>Expand All</button>
-                            <button className={styles.button} type="button" onClick={minimizeAll}>Minimize All</button>
-                        </div>
-                        <ButtonBugs handleCheckboxChange={handleCheckboxChange} toggleSection={toggleSection}/>
-                        <TabBugs handleCheckboxChange={handleCheckboxChange} toggleSection={toggleSection}/>
-                        <LinkBugs handleCheckboxChange={handleCheckboxChange} toggleSection={toggleSection}/>
-                        <FormBugs handleCheckboxChange={handleCheckboxChange} toggleSection={toggleSection}/>
-                        <button type="submit" className={styles.button}>Generate HTML</button>
-                    </form>
-                    {generatedUrl && (
-                        <div className={styles.generatedHTML}>
-                            <a href={generatedUrl} id="generatedUrl" target="_blank"
-                               rel="noopener noreferrer">Click Here For Preview Generated HTML</a>
-                        </div>
-                    )}
-                    <div id="testButtons" className={styles.testButtons}>
-                        <button className={styles.button} type="button"
-                                onClick={handleTestHTML}>{htmlButtonText}</button>
-                        <button className={styles.button} type="button" onClick={handleTestURL}>Test URL</button>
-                        <input
-                            type="file"
-                            accept=".html"
-                            style={{display: 'none'}}
-                            ref={fileInputRef}
-                            onChange={handleFileChange}
-                        />
-                        <button
-                            type="button"
-                            className={styles.button}
-                            onClick={handleButtonClick}
-                        >
-                            {uploadBtnText}
-                        </button>
-                    </div>
-                </>
             )}
+            <div id="testButtons" className={styles.testButtons}>
+                <button className={styles.button} type="button"
+                        onClick={handleTestHTML}>{htmlButtonText}</button>
+                <button className={styles.button} type="button" onClick={handleTestURL}>Test URL</button>
+                <input
+                    type="file"
+                    accept=".html"
+                    style={{display: 'none'}}
+                    ref={fileInputRef}
+                    onChange={handleFileChange}
+                />
+                <button
+                    type="button"
+                    className={styles.button}
+                    onClick={handleButtonClick}
+                >
+                    {uploadBtnText}
+                </button>
+            </div>
         </div>
     );
 }
\ No newline at end of file
@@ -1,5 +1,5 @@
 import {useRouter} from 'next/router';
-import {useEffect, useState} from 'react';
+import {useEffect, useRef, useState} from 'react';
 import styles from '../styles/results.module.css';
 import {CircularProgressbar, buildStyles} from 'react-circular-progressbar';
 import 'react-circular-progressbar/dist/styles.css';
@@ -21,8 +21,24 @@ export default function Results() {
     const [suggestion, setSuggestion] = useState('');
     const [loadingSuggestion, setLoadingSuggestion] = useState(false);
     const [codeSnippetVisible, setCodeSnippetVisible] = useState(false); // Add this state
+    const [streaming, setStreaming] = useState(false); // Results are still arriving from the server
+    const suggestionRequest = useRef(null); // Aborts the fix suggestion being streamed
+
+    // Stops generating a fix suggestion nobody will read anymore
+    const cancelSuggestion = () => {
+        if (suggestionRequest.current) {
+            suggestionRequest.current.abort();
+            suggestionRequest.current = null;
+        }
+    };
+
+    useEffect(() => cancelSuggestion, []);
 
     useEffect(() => {
+        const stream = sessionStorage.getItem('testStream');
+        if (stream) {
+            return streamResults(JSON.parse(stream));
+        }
         const content = sessionStorage.getItem('testResults');
         if (content) {
             try {
@@ -33,6 +49,71 @@ export default function Results() {
         }
     }, []);
 
+    // Shows the results of each component as soon as the server sent it
+    const streamResults = ({endpoint, params}) => {
+        const controller = new AbortController();
+        let content = {};
+        const finish = (results) => {
+            setStreaming(false);
+            setParsedContent(results);
+            sessionStorage.removeItem('testStream');
+            sessionStorage.setItem('testResults', JSON.stringify(results));
+        };
+        const fail = (message) => finish(`failed - ${message}`);
+        setStreaming(true);
+        setParsedContent(content);
+
+        const read = async () => {
+            const response = await fetch(`http://127.0.0.1:8000/stream/${endpoint}?${new URLSearchParams(params)}`, {
+                signal: controller.signal
+            });
+            if (!response.ok) {
+                // e.g. 429 when too many test runs are queued
+                const {message} = await response.json().catch(() => ({}));
+                fail(message || `Server responded with status ${response.status}`);
+                return;
+            }
+
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            while (true) {
+                const {value, done} = await reader.read();
+                if (done) {
+                    break;
+                }
+                buffer += decoder.decode(value, {stream: true});
+                const events = buffer.split('\n\n');
+                buffer = events.pop();
+                for (const event of events) {
+                    const type = (event.match(/^event: (.*)$/m) || [])[1] || 'message';
+                    const data = JSON.parse((event.match(/^data: (.*)$/m) || [])[1] || '{}');
+                    if (type === 'message') {
+                        const {family, item, result} = data;
+                        content = {...content, [family]: {...(content[family] || {}), [item]: result}};
+                        setParsedContent(content);
+                    } else if (type === 'failed') {
+                        fail(data.message);
+                        return;
+                    } else if (type === 'done') {
+                        finish(content);
+                        return;
+                    }
+                }
+            }
+            fail('The connection to the server was lost before the tests finished');
+        };
+
+        read().catch((error) => {
+            if (error.name === 'AbortError') {
+                return;
+            }
+            console.error('Failed to stream results:', error);
+            fail('Could not reach the server, please check it and try again');
+        });
+        return () => controller.abort();
+    };
+
     const handleHomeClick = () => {
         router.push('/');
     };
@@ -187,11 +268,16 @@ export default function Results() {
             codeSnippet: parsedContent[categoryName][item]['code_snippet']
         });
         setDescription(formattedResult.description);
+        cancelSuggestion();
+        setLoadingSuggestion(false);
         setSuggestion('');
         setCodeSnippetVisible(false);
     };
 
     const handleSuggestFix = async () => {
+        cancelSuggestion();
+        const controller = new AbortController();
+        suggestionRequest.current = controller;
         setLoadingSuggestion(true);
         setSuggestion('Generating fix...');
 
@@ -203,28 +289,61 @@ export default function Results() {
             code_snippet: selectedTest.codeSnippet
         };
 
+        let text = '';
+        const showSuggestion = () => {
+            const formattedSuggestion = text.replace(/^Suggested Fix:\s*/i, '');
+            setSuggestion(formattedSuggestion || 'No specific fix suggestion available.');
+        };
+
         try {
-            const response = await fetch('http://127.0.0.1:8000/suggest_fix', {
+            // The suggestion is streamed as server-sent events, it is shown as the model writes it
+            const response = await fetch('http://127.0.0.1:8000/stream/suggest_fix', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json'
                 },
-                body: JSON.stringify(testData)
+                body: JSON.stringify(testData),
+                signal: controller.signal
             });
 
-            const data = await response.json();
-            setLoadingSuggestion(false);
-
-            if (data.suggestion) {
-                const formattedSuggestion = data.suggestion.replace(/^Suggested Fix:\s*/i, '');
-                setSuggestion(formattedSuggestion);
-            } else {
-                setSuggestion('No specific fix suggestion available.');
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let finished = false;
+            while (!finished) {
+                const {value, done} = await reader.read();
+                if (done) {
+                    break;
+                }
+                buffer += decoder.decode(value, {stream: true});
+                const events = buffer.split('\n\n');
+                buffer = events.pop();
+                for (const event of events) {
+                    const type = (event.match(/^event: (.*)$/m) || [])[1] || 'message';
+                    const data = JSON.parse((event.match(/^data: (.*)$/m) || [])[1] || '{}');
+                    if (type === 'message') {
+                        text += data.token;
+                        showSuggestion();
+                    } else if (type === 'failed') {
+                        throw new Error(data.message);
+                    } else if (type === 'done') {
+                        finished = true;
+                    }
+                }
             }
+            showSuggestion();
+            setLoadingSuggestion(false);
         } catch (error) {
+            if (error.name === 'AbortError') {
+                return;
+            }
             setLoadingSuggestion(false);
             setSuggestion('Error generating fix suggestion');
             console.error('Error during suggestion generation:', error);
+        } finally {
+            if (suggestionRequest.current === controller) {
+                suggestionRequest.current = null;
+            }
         }
     };
 
@@ -237,6 +356,7 @@ export default function Results() {
             <div className={styles.overlay}></div>
             <div className={styles.content}>
                 <h1 className={styles.title}>Test Results</h1>
+                {streaming && <p className={styles.subtitle}>Testing in progress, results appear as they come in...</p>}
                 <div className={styles.sortContainer}>
                     <label htmlFor="sortOptions">Sort by: </label>
                     <select id="sortOptions" onChange={handleSortChange} value={sortOption}>
@@ -327,7 +447,11 @@ export default function Results() {
                         {selectedTest.result.props.children === 'FAILED' && !loadingSuggestion && (
                             <button onClick={handleSuggestFix} className={styles.suggestFixButton}>Suggest Fix</button>
                         )}
-                        <button onClick={() => setSelectedTest(null)} className={styles.closeButton}>Close</button>
+                        <button onClick={() => {
+                            cancelSuggestion();
+                            setLoadingSuggestion(false);
+                            setSelectedTest(null);
+                        }} className={styles.closeButton}>Close</button>
                     </div>
                 )}
             </div>
@@ -0,0 +1,34 @@
+from html_validator import check_html
+
+DOCUMENT = '<!DOCTYPE html>\n<html lang="en"><head><title>{title}</title></head><body>\n{body}\n</body></html>'
+
+
+def messages(body, title="Test"):
+    return [message["message"] for message in check_html(DOCUMENT.format(title=title, body=body))
+            if message["type"] == "error"]
+
+
+def test_textarea_content_is_text():
+    assert messages("<textarea><div></textarea>") == []
+    assert messages("<textarea>a </span> b</textarea>") == []
+
+
+def test_title_content_is_text():
+    assert messages("<p>Page</p>", title="<b>Bold</b> <i>title") == []
+
+
+def test_markup_after_textarea_is_checked():
+    assert "Unclosed element “div”." in messages("<textarea>text</textarea><div>")
+
+
+def test_template_children_skip_content_model():
+    assert messages("<template><li>Item</li><td>Cell</td></template>") == []
+    assert messages("<template><span><div>Block</div></span></template>") == []
+
+
+def test_template_children_still_closed():
+    assert "Unclosed element “div”." in messages("<template><div></template>")
+
+
+def test_content_model_checked_outside_template():
+    assert any("“li” not allowed as child" in message for message in messages("<div><li>Item</li></div>"))
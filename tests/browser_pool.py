@@ -0,0 +1,224 @@
+import atexit
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+from selenium import webdriver
+from selenium.common import WebDriverException
+from selenium.webdriver.chrome.service import Service
+from webdriver_manager.chrome import ChromeDriverManager
+
+from tests.load_profiles import apply_launch_options, apply_request_blocking, get_load_profile
+
+POOL_SIZE = int(os.environ.get("QA_BROWSER_POOL_SIZE", "2"))
+MAX_USES = int(os.environ.get("QA_BROWSER_MAX_USES", "50"))
+LEASE_TIMEOUT = float(os.environ.get("QA_BROWSER_LEASE_TIMEOUT", "120"))
+
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+
+def get_driver_path():
+    """
+    Resolves the chromedriver binary once per process.
+    :return: Path to the chromedriver executable.
+    """
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path is None:
+            _driver_path = ChromeDriverManager().install()
+    return _driver_path
+
+
+def setup_selenium_driver(profile=None):
+    """
+    :param profile: Load profile name, see tests.load_profiles.
+    :return: Headless Chrome WebDriver loading pages with the given profile.
+    """
+    _, settings = get_load_profile(profile)
+    options = webdriver.ChromeOptions()
+    options.add_argument('--headless')  # For headless operation
+    apply_launch_options(options, settings)
+    driver = webdriver.Chrome(service=Service(get_driver_path()), options=options)
+    apply_request_blocking(driver, settings)
+    return driver
+
+
+class PooledBrowser:
+    """A headless Chrome instance owned by the pool, with its lease counter."""
+
+    def __init__(self, profile=None):
+        self.driver = setup_selenium_driver(profile)
+        self.uses = 0
+
+    def is_healthy(self):
+        """Checks that the browser process still answers WebDriver commands."""
+        try:
+            self.driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    def reset(self):
+        """Returns the browser to a clean context before it is leased again."""
+        driver = self.driver
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+        driver.execute_script("try { localStorage.clear(); sessionStorage.clear(); } catch (e) {}")
+        driver.delete_all_cookies()
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+        driver.get("about:blank")
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception:
+            pass
+
+
+class BrowserPool:
+    """
+    Process-wide pool of warm headless browsers, all started with the same load profile.
+    Browsers are health checked when leased, reset when returned and recycled after max_uses leases.
+    """
+
+    def __init__(self, size=POOL_SIZE, max_uses=MAX_USES, profile=None):
+        self.size = size
+        self.max_uses = max_uses
+        self.profile = profile
+        self._idle = queue.LifoQueue()  # Most recently used browser first, it is the warmest
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._browsers = set()
+        self._closed = False
+
+    def _launch(self):
+        browser = PooledBrowser(self.profile)
+        with self._lock:
+            self._browsers.add(browser)
+        return browser
+
+    def _discard(self, browser):
+        with self._lock:
+            self._browsers.discard(browser)
+        browser.quit()
+
+    def acquire(self, timeout=LEASE_TIMEOUT):
+        """
+        Takes a healthy browser out of the pool, launching one if none is idle.
+        :param timeout: Seconds to wait for a free slot.
+        :return: PooledBrowser instance.
+        """
+        if self._closed:
+            raise RuntimeError("Browser pool is closed")
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError("No browser became available in the pool")
+        try:
+            while True:
+                try:
+                    browser = self._idle.get_nowait()
+                except queue.Empty:
+                    browser = self._launch()
+                    break
+                if browser.is_healthy():
+                    break
+                self._discard(browser)
+        except Exception:
+            self._slots.release()
+            raise
+        browser.uses += 1
+        return browser
+
+    def release(self, browser, broken=False):
+        """
+        Returns a leased browser to the pool.
+        :param browser: PooledBrowser previously returned by acquire.
+        :param broken: Whether the lease ended with a WebDriver failure.
+        """
+        try:
+            if broken or self._closed or browser.uses >= self.max_uses:
+                self._discard(browser)
+                return
+            try:
+                browser.reset()
+                self._idle.put(browser)
+            except Exception:
+                self._discard(browser)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def lease(self, timeout=LEASE_TIMEOUT):
+        """
+        Context manager yielding a WebDriver borrowed from the pool.
+        :param timeout: Seconds to wait for a free slot, TimeoutError is raised when it expires.
+        """
+        browser = self.acquire(timeout)
+        broken = False
+        try:
+            yield browser.driver
+        except WebDriverException:
+            broken = True
+            raise
+        finally:
+            self.release(browser, broken)
+
+    def warm_up(self, count=None):
+        """
+        Launches browsers ahead of the first request so it does not pay the cold start.
+        :param count: Number of browsers to start, defaults to the pool size.
+        """
+        browsers = []
+        try:
+            for _ in range(min(count or self.size, self.size)):
+                browsers.append(self.acquire())
+        finally:
+            for browser in browsers:
+                self.release(browser)
+
+    def close(self):
+        """Quits every browser owned by the pool."""
+        self._closed = True
+        with self._lock:
+            browsers = list(self._browsers)
+            self._browsers.clear()
+        for browser in browsers:
+            browser.quit()
+
+
+_pools = {}
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool(profile=None):
+    """
+    Returns the process-wide browser pool of a load profile, creating it on first use.
+    Launch options differ between profiles, so each profile used gets its own browsers.
+    :param profile: Load profile name, defaults to QA_LOAD_PROFILE.
+    """
+    profile, _ = get_load_profile(profile)
+    with _pool_lock:
+        pool = _pools.get(profile)
+        if pool is None:
+            pool = _pools[profile] = BrowserPool(profile=profile)
+            atexit.register(pool.close)
+    return pool
+
+
+def lease(timeout=LEASE_TIMEOUT, profile=None):
+    """Borrows a WebDriver from the process-wide pool of the given load profile."""
+    return get_browser_pool(profile).lease(timeout)
+
+
+def close_browser_pool():
+    """Closes the browsers of every load profile pool, the next lease starts new pools."""
+    with _pool_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
@@ -1,89 +1,254 @@
-from selenium import webdriver
 from selenium.common import TimeoutException, NoSuchElementException, StaleElementReferenceException, \
-    ElementNotInteractableException
+    ElementNotInteractableException, WebDriverException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-import base64
-from selenium.webdriver.support import expected_conditions as EC
-
+from concurrent.futures import ThreadPoolExecutor
+import os
+import queue
+import threading
+from tests import browser_pool
+from tests.content_server import load_html_content
+from tests.component_cache import PreviousResults
+from tests.dom_snapshot import BUTTON_SELECTOR, take_snapshot
+from tests.page_readiness import wait_until_loaded, wait_until_ready
+
+READY_TIMEOUT = float(os.environ.get("QA_BUTTONS_READY_TIMEOUT", "10"))
+CLICK_WORKERS = int(os.environ.get("QA_CLICK_WORKERS", "2"))
+RELOAD_TIMEOUT = float(os.environ.get("QA_CLICK_RELOAD_TIMEOUT", "2"))
+SETTLE_TIMEOUT = float(os.environ.get("QA_CLICK_SETTLE_TIMEOUT", "1"))
+LEARN_WINDOW_MS = int(os.environ.get("QA_CLICK_LEARN_MS", "500"))
+
+# Tracks the DOM mutations of a loaded copy of the page. While disarmed it learns which nodes change on their own
+# (carousels, clocks, timers), while armed for a click it only counts the mutations of other nodes.
+# A navigation drops the tracker, the copy then counts as changed.
+TRACK_CHANGES_SCRIPT = """
+if (!window.__qaTracker) {
+    const tracker = window.__qaTracker = {armed: false, changed: false};
+    const background = new WeakMap();
+    new MutationObserver((mutations) => {
+        for (const mutation of mutations) {
+            const kind = mutation.type + ':' + (mutation.attributeName || '');
+            const kinds = background.get(mutation.target) || new Set();
+            if (!tracker.armed) {
+                kinds.add(kind);
+                background.set(mutation.target, kinds);
+            } else if (!kinds.has(kind)) {
+                tracker.changed = true;
+            }
+        }
+    }).observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+}
+"""
+ARM_TRACKER_SCRIPT = TRACK_CHANGES_SCRIPT + "window.__qaTracker.armed = true; window.__qaTracker.changed = false;"
+IS_PRISTINE_SCRIPT = """
+const tracker = window.__qaTracker;
+if (!tracker) {
+    return false;
+}
+tracker.armed = false;
+return !tracker.changed;
+"""
 
-def setup_selenium_driver():
-    options = webdriver.ChromeOptions()
-    options.add_argument('--headless')  # For headless operation
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-    return driver
 
+def perform_tests(driver, timeout=READY_TIMEOUT, previous=None, profile=None):
+    """Perform form input and submission tests on the loaded content."""
+    results = dict(iter_tests(driver, timeout, previous, profile))
+    return results
 
-def load_html_content(driver, html_content):
-    """Load HTML content into Selenium browser using data URL."""
-    encoded_html = base64.b64encode(html_content.encode('utf-8')).decode('utf-8')
-    driver.get(f"data:text/html;base64,{encoded_html}")
 
+def iter_tests(driver, timeout=READY_TIMEOUT, previous=None, profile=None):
+    """
+    Perform the button tests on the loaded content, yielding each button's results in page order as soon as it was tested.
+    Every button is clicked on a pristine copy of the page, and the clicks are spread over extra pooled browsers.
+    Buttons found unchanged in previous are not tested again.
+    """
+    # Wait until the page settled, then check once for buttons
+    wait_until_ready(driver, timeout)
 
-def perform_tests(driver):
-    """Perform form input and submission tests on the loaded content."""
+    # Read every button's properties in one round trip, only the clicks talk to the elements
+    buttons = take_snapshot(driver, BUTTON_SELECTOR)
+    page_url = driver.current_url
+    descriptions = []
     results = {}
+    clicks = []
+    for index, button in enumerate(buttons):
+        button_text = button['text'] or button['title'] or button['value'] or "Unnamed Button"
+        descriptions.append(f"Button {index + 1}: {button_text}")  # Create a unique description for each button
+
+        # Reuse the results of a button unchanged since the previous run
+        known = previous.get(button['outerHTML']) if previous else None
+        if known is not None:
+            results[index] = known
+            continue
+
+        # Determine visibility
+        visibility_test = "passed - Button is visible." if button['visible'] and button_text != "Unnamed Button" else "failed - Button is hidden."
+
+        # Determine interactivity
+        interact_test = "passed - Button is interactive." if button['enabled'] else "failed - Button is not interactive."
+
+        button_results = {
+            "Visibility Test": visibility_test,
+            "Interactivity Test": interact_test,
+            "Click Test": "NOT ATTEMPTED - Button is not visible or not interactive.",
+            "code_snippet": button['outerHTML']
+        }
+        results[index] = button_results
+        # Click the button later if it's visible and interactive
+        if button['visible'] and button['enabled']:
+            clicks.append(index)
+        elif previous:
+            previous.put(button['outerHTML'], button_results)
+
+    tested = set(results) - set(clicks)
+    next_index = 0
+    if clicks:
+        # Learn the page's own background mutations from now on, they don't make a copy dirty
+        install_tracker(driver)
+    clicked = iter_clicks(driver, page_url, clicks, RELOAD_TIMEOUT, profile)
     try:
-        # Wait until buttons are potentially loaded
-        WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.CSS_SELECTOR,
-                                                                        "button, input[type='button'], input[type='submit'], input[type='reset'], a[role='button']")))
-        # Select all elements that could be considered buttons
-        buttons = driver.find_elements(By.CSS_SELECTOR,
-                                       "button, input[type='button'], input[type='submit'], input[type='reset'], a[role='button']")
-    except TimeoutException:
-        return results
+        while True:
+            # Report the buttons in page order, as soon as every button before them was tested
+            while next_index in tested:
+                yield descriptions[next_index], results[next_index]
+                next_index += 1
+            index, click_test = next(clicked, (None, None))
+            if index is None:
+                break
+            results[index]["Click Test"] = click_test
+            tested.add(index)
+            if previous:
+                previous.put(buttons[index]['outerHTML'], results[index])
+    finally:
+        clicked.close()
 
-    for index, button in enumerate(buttons):
-        retry_count = 3
-        while retry_count > 0:
+
+def iter_clicks(driver, page_url, indexes, timeout=RELOAD_TIMEOUT, profile=None):
+    """
+    Clicks buttons in parallel, each on its own pristine copy of the page.
+    The loaded driver takes buttons as well as up to CLICK_WORKERS - 1 browsers borrowed from the pool when free.
+    :param driver: WebDriver holding the loaded page.
+    :param page_url: URL the copies of the page are loaded from.
+    :param indexes: Positions of the buttons to click among the page buttons.
+    :param timeout: Seconds to wait for a reloaded copy to load.
+    :param profile: Load profile of the borrowed browsers.
+    :return: Generator of (index, click test result) tuples, in the order the clicks finish.
+    """
+    if not indexes:
+        return
+    pending = queue.Queue()
+    for index in indexes:
+        pending.put(index)
+    finished = queue.Queue()
+    stop = threading.Event()
+
+    def click_pending(worker_driver, pristine):
+        while not stop.is_set():
             try:
-                button_html = button.get_attribute('outerHTML')
-                button_text = button.text.strip() or button.get_attribute('title') or button.get_attribute(
-                    'value') or "Unnamed Button"
-                button_description = f"Button {index + 1}: {button_text}"  # Create a unique description for each button
+                index = pending.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                click_test, pristine = click_on_copy(worker_driver, page_url, index, pristine, timeout)
+            except Exception as e:
+                click_test, pristine = f"failed - {str(e)}", False
+            finished.put((index, click_test))
+
+    def click_on_borrowed_browser():
+        try:
+            with browser_pool.lease(timeout=0, profile=profile) as borrowed_driver:
+                click_pending(borrowed_driver, False)
+        except Exception:
+            pass  # No free browser, the other workers take its buttons
+
+    workers = min(CLICK_WORKERS, len(indexes))
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        executor.submit(click_pending, driver, True)
+        for _ in range(workers - 1):
+            executor.submit(click_on_borrowed_browser)
+        for _ in indexes:
+            yield finished.get()
+    finally:
+        stop.set()
+        # The loaded driver goes back to the caller only once no worker uses it anymore
+        executor.shutdown(wait=True)
+
+
+def click_on_copy(driver, page_url, index, pristine, timeout=RELOAD_TIMEOUT):
+    """
+    Clicks a button on a pristine copy of the page, the page is reloaded only when an earlier click changed it.
+    Only the mutations caused after the click count as a change, the page's own animations and timers don't.
+    The page is judged once it stayed quiet for the readiness quiet window, or after SETTLE_TIMEOUT.
+    :param driver: WebDriver instance.
+    :param page_url: URL of the page.
+    :param index: Position of the button among the page buttons.
+    :param pristine: Whether the page in the driver is still untouched.
+    :param timeout: Seconds to wait for a reloaded page to load, its DOM is not awaited to settle.
+    :return: (click test result, whether the page is still untouched after the click) tuple.
+    """
+    if not pristine:
+        dismiss_alert(driver)
+        driver.get(page_url)
+        wait_until_loaded(driver, timeout)
+        install_tracker(driver)
+    buttons = driver.find_elements(By.CSS_SELECTOR, BUTTON_SELECTOR)
+    if index >= len(buttons):
+        return "failed - Button not found on a fresh copy of the page", True
+    driver.execute_script(ARM_TRACKER_SCRIPT)
+    click_test = click_button(driver, buttons[index], index)
+    # Handlers scheduled by the click (timers, fetch callbacks) change the page after it returned
+    wait_until_ready(driver, SETTLE_TIMEOUT)
+    try:
+        pristine = driver.execute_script(IS_PRISTINE_SCRIPT) is True
+    except WebDriverException:
+        pristine = False
+    return click_test, pristine
 
-                # Determine visibility
-                visibility_test = "passed - Button is visible." if button.is_displayed() and button_text != "Unnamed Button" else "failed - Button is hidden."
 
-                # Determine interactivity
-                interact_test = "passed - Button is interactive." if button.is_enabled() else "failed - Button is not interactive."
+def install_tracker(driver, timeout=SETTLE_TIMEOUT):
+    """
+    Installs the mutation tracker on a loaded page, then lets it learn the page's own changes until the DOM stayed
+    unchanged for LEARN_WINDOW_MS, or for the timeout on pages that never go quiet.
+    """
+    driver.execute_script(TRACK_CHANGES_SCRIPT)
+    wait_until_ready(driver, timeout, LEARN_WINDOW_MS)
 
-                # Attempt to click the button if it's visible and interactive
-                try:
-                    if button.is_displayed() and button.is_enabled():
-                        button.click()
-                        # Example of checking for some JavaScript condition after click
-                        if not driver.execute_script("return document.getElementById('expected-element-id') !== null"):
-                            click_test = "failed - Expected element not found after click"
-                        else:
-                            click_test = "passed - Button clicked and expected element found."
-                    else:
-                        click_test = "NOT ATTEMPTED - Button is not visible or not interactive."
-                except Exception as e:
-                    click_test = f"failed - {str(e)}"
-
-                results[button_description] = {
-                    "Visibility Test": visibility_test,
-                    "Interactivity Test": interact_test,
-                    "Click Test": click_test,
-                    "code_snippet": button_html
-                }
-
-                break  # Exit the retry loop if successful
-            except StaleElementReferenceException:
-                retry_count -= 1
-                if retry_count > 0:
-                    # Relocate the buttons
-                    buttons = driver.find_elements(By.CSS_SELECTOR,
-                                                   "button, input[type='button'], input[type='submit'], input[type='reset'], a[role='button']")
-                    # Check if the index is still valid
-                    if index >= len(buttons):
-                        break  # Exit if the index is out of range
-                    button = buttons[index]  # Re-assign the button element
 
-    return results
+def dismiss_alert(driver):
+    """Closes a dialog opened by the previous click, it would block the next commands."""
+    try:
+        driver.switch_to.alert.dismiss()
+    except WebDriverException:
+        pass
+
+
+def click_button(driver, element, index):
+    """
+    Clicks a button and checks the page reaction.
+    Relocates the button when a previous click replaced it in the DOM.
+    :param driver: WebDriver instance.
+    :param element: WebElement of the button.
+    :param index: Position of the button among the page buttons.
+    :return: Click test result.
+    """
+    retry_count = 3
+    while True:
+        try:
+            element.click()
+            # Example of checking for some JavaScript condition after click
+            if not driver.execute_script("return document.getElementById('expected-element-id') !== null"):
+                return "failed - Expected element not found after click"
+            return "passed - Button clicked and expected element found."
+        except StaleElementReferenceException as e:
+            retry_count -= 1
+            buttons = driver.find_elements(By.CSS_SELECTOR, BUTTON_SELECTOR) if retry_count > 0 else []
+            # Check if the index is still valid
+            if index >= len(buttons):
+                return f"failed - {str(e)}"
+            element = buttons[index]  # Re-assign the button element
+        except Exception as e:
+            return f"failed - {str(e)}"
 
 
 # Test data for data-driven testing and boundary testing
@@ -184,17 +349,34 @@ def test_form_submission(form, driver):
 
 def execute_forms_url_tests(url):
     """Load a URL and perform tests."""
-    driver = setup_selenium_driver()
-    driver.get(url)
-    results = perform_tests(driver)
-    driver.quit()
+    with browser_pool.lease() as driver:
+        driver.get(url)
+        results = perform_tests(driver)
     return results
 
 
 def execute_forms_html_tests(html_content):
     """Load HTML content and perform tests."""
-    driver = setup_selenium_driver()
-    load_html_content(driver, html_content)
-    results = perform_tests(driver)
-    driver.quit()
+    with browser_pool.lease() as driver:
+        load_html_content(driver, html_content)
+        results = perform_tests(driver)
     return results
+
+
+def execute_session_tests(session):
+    """Perform tests on the page loaded by a PageSession, on a fresh copy since the tests click on it."""
+    if not session.needs_browser(BUTTON_SELECTOR):
+        return {}
+    previous = PreviousResults.for_session(session, "buttons")
+    with session.fork() as driver:
+        results = perform_tests(driver, previous=previous, profile=session.profile)
+    return results
+
+
+def iter_session_tests(session):
+    """Yield the button results of the page loaded by a PageSession as soon as each button was tested."""
+    if not session.needs_browser(BUTTON_SELECTOR):
+        return
+    previous = PreviousResults.for_session(session, "buttons")
+    with session.fork() as driver:
+        yield from iter_tests(driver, previous=previous, profile=session.profile)
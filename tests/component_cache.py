@@ -0,0 +1,76 @@
+import os
+import re
+
+from result_cache import ResultCache, content_hash
+
+# Incremental re-testing, set QA_INCREMENTAL=0 to test every component on every run
+INCREMENTAL = os.environ.get("QA_INCREMENTAL", "1") == "1"
+COMPONENT_CACHE_TTL = float(os.environ.get("QA_COMPONENT_CACHE_TTL", "3600"))
+
+# Page parts that can change the behavior of any button or form: scripts and styles
+CONTEXT_PATTERN = re.compile(r"<script\b.*?</script>|<style\b.*?</style>|<link\b[^>]*>", re.IGNORECASE | re.DOTALL)
+BETWEEN_TAGS = re.compile(r">\s+<")
+WHITESPACE = re.compile(r"\s+")
+
+component_results = ResultCache("component_results", memory_entries=1024, disk_entries=50000,
+                                ttl=COMPONENT_CACHE_TTL)
+
+
+def normalize_html(outer_html):
+    """Collapses the whitespace of an outerHTML so re-indenting a component does not change its fingerprint."""
+    return WHITESPACE.sub(" ", BETWEEN_TAGS.sub("><", outer_html.strip()))
+
+
+def fingerprint(outer_html):
+    return content_hash(normalize_html(outer_html))
+
+
+def page_context(html):
+    """
+    :param html: HTML code of the page.
+    :return: Hash of the page scripts and styles.
+    """
+    return content_hash(*CONTEXT_PATTERN.findall(html or ""))
+
+
+class PreviousResults:
+    """
+    Results of the components tested by the previous runs on a page, looked up by component fingerprint.
+    Only the components that were added or changed since then need to be tested again.
+    """
+
+    def __init__(self, source, family, context=""):
+        """
+        :param source: File path or URL of the page.
+        :param family: Test family, e.g. 'buttons'.
+        :param context: Hash of the page parts the family results depend on, a change re-tests every component.
+        """
+        self.scope = (source or "", family, context)
+
+    @classmethod
+    def for_session(cls, session, family):
+        """
+        :param session: PageSession of the tested page.
+        :param family: Test family, its results depend on the page scripts, styles and load profile.
+        :return: PreviousResults instance, None when incremental re-testing is disabled.
+        """
+        if not INCREMENTAL:
+            return None
+        return cls(session.source, family, content_hash(session.profile, page_context(session.html)))
+
+    def key(self, outer_html):
+        return content_hash(*self.scope, fingerprint(outer_html))
+
+    def get(self, outer_html):
+        """
+        :param outer_html: HTML code of the component.
+        :return: Test results of the unchanged component with its current code snippet, None if it is new or changed.
+        """
+        results = component_results.get(self.key(outer_html))
+        if results is None:
+            return None
+        # Same fingerprint, but the snippet may differ in whitespace
+        return {**results, "code_snippet": outer_html}
+
+    def put(self, outer_html, results):
+        component_results.put(self.key(outer_html), results)
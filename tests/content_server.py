@@ -0,0 +1,244 @@
+import mimetypes
+import os
+import posixpath
+import re
+import secrets
+import threading
+from collections import OrderedDict, namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote, urljoin, urlparse
+
+from result_cache import content_hash
+
+SERVER_HOST = os.environ.get("QA_CONTENT_SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.environ.get("QA_CONTENT_SERVER_PORT", "0"))  # 0 picks a free port
+SERVER_DOMAIN = os.environ.get("QA_CONTENT_SERVER_DOMAIN", "localhost")
+MAX_BYTES = int(os.environ.get("QA_CONTENT_SERVER_MAX_BYTES", str(256 * 1024 * 1024)))
+ASSET_DIRS = [path for path in os.environ.get("QA_CONTENT_SERVER_ASSET_DIRS", "generated_html").split(os.pathsep)
+              if path]
+
+# Never served, even inside an asset directory: the working directory holds the API key and the configuration,
+# and the uploads of all the users share one directory
+BLOCKED_DIRS = (".", "uploaded_files")
+
+PAGE_NAME = "index.html"  # Name of a page published without a source file
+
+# URLs of the files a page or a stylesheet loads: src, href, poster and data attributes and CSS url() values
+REFERENCE_PATTERN = re.compile(r"""\b(?:src|href|poster|data)\s*=\s*["']?([^"'\s>]+)|url\(\s*["']?([^"')\s]+)""",
+                               re.IGNORECASE)
+
+Page = namedtuple("Page", ["content", "base_dir", "name", "files", "digest"])
+
+
+def referenced_files(text, path=""):
+    """
+    :param text: HTML or CSS code.
+    :param path: Path of the document relative to its directory, its relative URLs resolve against it.
+    :return: Set of the paths, relative to the directory, of the local files the code references.
+    """
+    files = set()
+    for match in REFERENCE_PATTERN.finditer(text):
+        url = urlparse(urljoin("/" + path, match.group(1) or match.group(2)))
+        if not url.scheme and not url.netloc:
+            files.add(posixpath.normpath(unquote(url.path)).lstrip("/"))
+    return files
+
+
+def asset_directory(source):
+    """
+    :param source: Path of the file a page came from.
+    :return: Real path of its directory if its files may be served, None otherwise.
+    """
+    base_dir = os.path.realpath(os.path.dirname(os.path.abspath(source)))
+    if any(base_dir == os.path.realpath(path) for path in BLOCKED_DIRS):
+        return None
+    for path in ASSET_DIRS:
+        root = os.path.realpath(path)
+        if os.path.commonpath([root, base_dir]) == root:
+            return base_dir
+    return None
+
+
+class ContentStore:
+    """
+    Documents served to the browsers, each under a random key that also names its origin.
+    Publishing the same document again reuses its key.
+    The least recently published documents are dropped once the total size exceeds max_bytes.
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._pages = OrderedDict()
+        self._keys = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def put(self, content, base_dir=None, name=PAGE_NAME, files=()):
+        """
+        :param content: Document bytes.
+        :param base_dir: Directory the relative URLs of the document resolve into, None to serve the document alone.
+        :param name: File name the document is served under.
+        :param files: Paths relative to base_dir that the document references, the only files served with it.
+        :return: Key the document is served under.
+        """
+        digest = content_hash(content, base_dir, name)
+        with self._lock:
+            key = self._keys.get(digest)
+            if key is not None:
+                self._pages.move_to_end(key)
+                return key
+            key = secrets.token_hex(16)
+            self._pages[key] = Page(content, base_dir, name, set(files), digest)
+            self._keys[digest] = key
+            self._size += len(content)
+            # Always keep the document just published, even if it is larger than the limit
+            while self._size > self.max_bytes and len(self._pages) > 1:
+                _, evicted = self._pages.popitem(last=False)
+                del self._keys[evicted.digest]
+                self._size -= len(evicted.content)
+        return key
+
+    def get(self, key):
+        """
+        :return: Page, or None for an unknown key.
+        """
+        with self._lock:
+            return self._pages.get(key)
+
+    def allow(self, key, files):
+        """Adds files referenced by a served stylesheet to the files of a page."""
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None:
+                page.files.update(files)
+
+
+def resolve_file(base_dir, path):
+    """
+    :param base_dir: Source directory of a page.
+    :param path: URL path relative to the page.
+    :return: Path of the file inside base_dir, None when the path leaves it or is not a file.
+    """
+    path = posixpath.normpath(unquote(path))
+    if path.startswith(("/", "..")):
+        return None
+    root = os.path.realpath(base_dir)
+    file_path = os.path.realpath(os.path.join(root, *path.split("/")))
+    if os.path.commonpath([root, file_path]) != root or not os.path.isfile(file_path):
+        return None
+    return file_path
+
+
+class ContentRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves the page of a key at http://<key>.<domain>:<port>/<file name>,
+    and the files next to its source file that it references at their relative paths.
+    """
+    store = None
+    domain = SERVER_DOMAIN
+
+    def find(self):
+        """:return: (body bytes, content type) tuple, or None when nothing is served at the path."""
+        host = (self.headers.get("Host") or "").rsplit(":", 1)[0].lower()
+        key, _, domain = host.partition(".")
+        if domain != self.domain.lower():
+            return None
+        page = self.store.get(key)
+        if page is None:
+            return None
+        path = posixpath.normpath(unquote(self.path.split("?", 1)[0].split("#", 1)[0])).lstrip("/")
+        if path in ("", ".", page.name):
+            return page.content, "text/html; charset=utf-8"
+        if page.base_dir is None or path not in page.files:
+            return None
+        file_path = resolve_file(page.base_dir, path)
+        if file_path is None:
+            return None
+        with open(file_path, "rb") as file:
+            body = file.read()
+        content_type = mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+        if content_type == "text/css":
+            # Fonts and images of a stylesheet resolve against the stylesheet
+            self.store.allow(key, referenced_files(body.decode("utf-8", errors="replace"), path))
+        return body, content_type
+
+    def send_page(self, include_body):
+        found = self.find()
+        if found is None:
+            self.send_error(404)
+            return
+        body, content_type = found
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        if include_body:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        self.send_page(True)
+
+    def do_HEAD(self):
+        self.send_page(False)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ContentServer:
+    """
+    In-process HTTP server handing the HTML under test to the browsers from memory.
+    Every page gets its own http origin, <key>.localhost by default, so storage and cookies behave like on a deployed
+    site and a page cannot read the other pages. The files that a page references next to its source file are served
+    with it when that directory is inside an asset directory, so its scripts, stylesheets and images load.
+    """
+
+    def __init__(self, host=SERVER_HOST, port=SERVER_PORT, max_bytes=MAX_BYTES, domain=SERVER_DOMAIN):
+        self.store = ContentStore(max_bytes)
+        handler = type("BoundContentRequestHandler", (ContentRequestHandler,), {"store": self.store, "domain": domain})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self.domain = domain
+        self.port = self._server.server_port
+        threading.Thread(target=self._server.serve_forever, name="qa-content-server", daemon=True).start()
+
+    def publish(self, html_content, source=None):
+        """
+        :param html_content: HTML code.
+        :param source: Path of the file the HTML code came from, the files it references next to it are served with it.
+        :return: URL serving the document.
+        """
+        base_dir, name, files = None, PAGE_NAME, ()
+        if source and not source.startswith("http"):
+            name = os.path.basename(source)
+            base_dir = asset_directory(source)
+            if base_dir:
+                files = referenced_files(html_content, name)
+        key = self.store.put(html_content.encode('utf-8'), base_dir, name, files)
+        return f"http://{key}.{self.domain}:{self.port}/{quote(name)}"
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def get_content_server():
+    """Returns the process-wide content server, starting it on first use."""
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = ContentServer()
+    return _server
+
+
+def load_html_content(driver, html_content, source=None):
+    """
+    Load HTML content into Selenium browser from the in-process content server.
+    :param source: Path of the file the HTML content came from, its relative URLs are resolved in its directory.
+    """
+    driver.get(get_content_server().publish(html_content, source))
@@ -0,0 +1,62 @@
+BUTTON_SELECTOR = "button, input[type='button'], input[type='submit'], input[type='reset'], a[role='button']"
+FIELD_SELECTOR = "input, textarea, select"
+
+# Collects everything the non-interactive checks need in a single WebDriver round trip.
+# The element itself is returned as well, for the checks that still have to interact with it.
+SNAPSHOT_SCRIPT = """
+const selector = arguments[0];
+const root = arguments[1] || document;
+
+function isVisible(el) {
+    if (!el.isConnected || (el.tagName === 'INPUT' && el.type === 'hidden')) {
+        return false;
+    }
+    for (let node = el; node && node.nodeType === Node.ELEMENT_NODE; node = node.parentElement) {
+        const style = window.getComputedStyle(node);
+        if (style.display === 'none' || style.opacity === '0') {
+            return false;
+        }
+    }
+    if (window.getComputedStyle(el).visibility !== 'visible') {
+        return false;
+    }
+    const rect = el.getBoundingClientRect();
+    return rect.width > 0 && rect.height > 0;
+}
+
+return Array.from(root.querySelectorAll(selector)).map(el => {
+    const attributes = {};
+    for (const attribute of el.attributes) {
+        attributes[attribute.name] = attribute.value;
+    }
+    const rect = el.getBoundingClientRect();
+    const visible = isVisible(el);
+    return {
+        element: el,
+        tag: el.tagName.toLowerCase(),
+        attributes: attributes,
+        type: el.type || null,
+        name: el.name || attributes.name || null,
+        value: el.value !== undefined ? String(el.value) : (attributes.value || null),
+        title: el.title || null,
+        text: visible ? el.innerText.trim() : '',
+        visible: visible,
+        enabled: !el.matches(':disabled'),
+        checked: !!el.checked,
+        rect: {x: rect.x, y: rect.y, width: rect.width, height: rect.height},
+        outerHTML: el.outerHTML
+    };
+});
+"""
+
+
+def take_snapshot(driver, selector, root=None):
+    """
+    Takes a snapshot of all the elements matching a CSS selector with one execute_script call.
+    :param driver: WebDriver instance.
+    :param selector: CSS selector of the candidate elements.
+    :param root: Optional WebElement to search under instead of the whole document.
+    :return: List of dictionaries with the tag, attributes, text, visibility, enabled state,
+             bounding box, outerHTML and WebElement of every matching element.
+    """
+    return driver.execute_script(SNAPSHOT_SCRIPT, selector, root) or []
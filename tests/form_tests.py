@@ -1,49 +1,69 @@
-from selenium import webdriver
 from selenium.common import TimeoutException, NoSuchElementException, StaleElementReferenceException, \
     ElementNotInteractableException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.select import Select
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-import base64
-
-
-def setup_selenium_driver():
-    options = webdriver.ChromeOptions()
-    options.add_argument('--headless')  # For headless operation
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-    return driver
-
+import os
+from tests import browser_pool
+from tests.content_server import load_html_content
+from tests.component_cache import PreviousResults
+from tests.dom_snapshot import FIELD_SELECTOR, take_snapshot
+from tests.page_readiness import wait_until_ready
+
+READY_TIMEOUT = float(os.environ.get("QA_FORMS_READY_TIMEOUT", "10"))
+
+FILL_STRATEGY = os.environ.get("QA_FILL_STRATEGY", "exhaustive")
+KEYSTROKE_SAMPLE = int(os.environ.get("QA_KEYSTROKE_SAMPLE", "1"))
+FILL_STRATEGIES = ("exhaustive", "boundary")
+
+TEXT_TYPES = ["text", "password", "email", "textarea", "number", "url", "date", "tel"]
+
+# Sets the values of several fields at once like a user would, through the native setter and input/change events
+INJECT_VALUES_SCRIPT = """
+const fields = arguments[0];
+const values = arguments[1];
+return fields.map((field, i) => {
+    const prototype = field.tagName === 'TEXTAREA' ? HTMLTextAreaElement.prototype : HTMLInputElement.prototype;
+    Object.getOwnPropertyDescriptor(prototype, 'value').set.call(field, values[i]);
+    field.dispatchEvent(new Event('input', {bubbles: true}));
+    field.dispatchEvent(new Event('change', {bubbles: true}));
+    return field.value;
+});
+"""
+
+
+def perform_tests(driver, timeout=READY_TIMEOUT, previous=None):
+    """Perform form input and submission tests on the loaded content."""
+    results = dict(iter_tests(driver, timeout, previous))
+    return results
 
-def load_html_content(driver, html_content):
-    """Load HTML content into Selenium browser using data URL."""
-    encoded_html = base64.b64encode(html_content.encode('utf-8')).decode('utf-8')
-    driver.get(f"data:text/html;base64,{encoded_html}")
 
+def iter_tests(driver, timeout=READY_TIMEOUT, previous=None):
+    """
+    Perform the form tests on the loaded content, yielding each form's results as soon as it was tested.
+    Forms found unchanged in previous are not tested again.
+    """
+    # Wait until the page settled, then check once for forms
+    wait_until_ready(driver, timeout)
 
-def perform_tests(driver):
-    """Perform form input and submission tests on the loaded content."""
-    results = {}
-    try:
-        forms = WebDriverWait(driver, 10).until(
-            lambda x: x.find_elements(By.TAG_NAME, "form") if x.find_elements(By.TAG_NAME, "form") else False
-        )
-    except TimeoutException:
-        return results
+    forms = take_snapshot(driver, "form")
+    for form_index, form in enumerate(forms):
+        form_description = form['attributes'].get('id') or f"Form {form_index + 1}"
 
-    if not forms:
-        return results
+        # Reuse the results of a form unchanged since the previous run
+        known = previous.get(form['outerHTML']) if previous else None
+        if known is not None:
+            yield form_description, known
+            continue
 
-    for form_index, form in enumerate(forms):
-        form_description = form.get_attribute('id') or f"Form {form_index + 1}"
-        form_html = form.get_attribute('outerHTML')
-        results[form_description] = {
-            **test_input_fields(form),
-            **test_form_submission(form, driver),
-            "code_snippet": form_html
+        results = {
+            **test_input_fields(form['element']),
+            **test_form_submission(form['element'], driver),
+            "code_snippet": form['outerHTML']
         }
-    return results
+        if previous:
+            previous.put(form['outerHTML'], results)
+        yield form_description, results
 
 
 # Test data for data-driven testing and boundary testing
@@ -59,79 +79,82 @@ test_data = {
 
 test_data['card'] = test_data['number']
 
-
-def test_input_fields(form):
-    """Test input fields within a form using data-driven tests and boundary testing."""
+# Field names -> input type they require and what a wrong type lets through
+FIELD_TYPE_RULES = [
+    (["email", "mail"], "email", "invalid email inputs"),
+    (["card", "credit card", "phone number"], "number", "non-numeric inputs"),
+    (["birthdate", "date"], "date", "non-date values"),
+    (["phone", "telephone"], "tel", "non-telephone values"),
+    (["confirm_password"], "password", "non-password values"),
+]
+
+
+def check_field_type(tag, input_type, input_name):
+    """
+    Checks that a field's type matches what its name asks for, needs only the markup.
+    :param tag: Tag name of the field.
+    :param input_type: Type of the field, its tag name for textarea and select.
+    :param input_name: Name of the field.
+    :return: (test description, failure) tuple when the type does not match, None otherwise.
+    """
+    for names, expected_type, accepted in FIELD_TYPE_RULES:
+        if input_name.lower() in names and input_type != expected_type:
+            return f"{tag} {input_name}", f"Failed - Input type should be '{expected_type}' but currently accepts {accepted}"
+    return None
+
+
+def test_input_fields(form, strategy=FILL_STRATEGY):
+    """
+    Test input fields within a form using data-driven tests and boundary testing.
+    The values are injected with JavaScript, a few rows of fields at a time, only a sample is typed with keystrokes.
+    :param form: WebElement of the form.
+    :param strategy: 'exhaustive' or 'boundary', see get_test_values.
+    """
     results = {}
-    forms_elements = form.find_elements(By.CSS_SELECTOR, "input, textarea, select")
+    injected_fields = []
+    field_verdicts = []
+    # Read the type, name and state of every field in one round trip
+    fields = take_snapshot(form.parent, FIELD_SELECTOR, form)
 
-    for input in forms_elements:
-        input_type = input.get_attribute("type") or input.tag_name
-        input_name = input.get_attribute("name") or "Unnamed Input"
+    for field in fields:
+        input = field['element']
+        input_type = field['type'] or field['tag']
+        input_name = field['name'] or "Unnamed Input"
 
         # Custom checks for specific input names
-        if input_name.lower() in ["email", "mail"] and input_type != "email":
-            results[
-                f"{input.tag_name} {input_name}"] = "Failed - Input type should be 'email' but currently accepts invalid email inputs"
-            continue
-        if input_name.lower() in ["card", "credit card", "phone number"] and input_type != "number":
-            results[
-                f"{input.tag_name} {input_name}"] = "Failed - Input type should be 'number' but currently accepts non-numeric inputs"
-            continue
-        if input_name.lower() in ["birthdate", "date"] and input_type != "date":
-            results[
-                f"{input.tag_name} {input_name}"] = "Failed - Input type should be 'date' but currently accepts non-date values"
-            continue
-        if input_name.lower() in ["phone", "telephone"] and input_type != "tel":
-            results[
-                f"{input.tag_name} {input_name}"] = "Failed - Input type should be 'tel' but currently accepts non-telephone values"
+        mismatch = check_field_type(field['tag'], input_type, input_name)
+        if mismatch:
+            results[mismatch[0]] = mismatch[1]
             continue
-        if input_name.lower() in ["confirm_password"] and input_type != "password":
-            results[
-                f"{input.tag_name} {input_name}"] = "Failed - Input type should be 'password' but currently accepts non-password values"
-            continue
-
-        elif input_type in ["text", "password", "email", "textarea", "number", "url", "date", "tel"]:
-            for value in test_data.get(input_type, ["test"]):  # Use default ["test"] if input_type is not in test_data
-                test_description = f"{input.tag_name} {input_type} {input_name} with tested value (length {len(value)})"
-                test_result = "passed - Filled or Checked"
-
-                try:
-                    input.clear()  # Clear the input field before each test
-
-                    if input_type in ["text", "password", "email", "textarea", "url", "date", "tel"]:
-                        input.send_keys(value)
-                    elif input_type == "number":
-                        input.send_keys(value)
-                        entered_value = input.get_attribute("value")
 
-                        if not value.isnumeric() and entered_value != "":
-                            test_result = f"Failed - Numeric input accepted non-numeric value:\n'{value}'"
-                        elif value.isnumeric() and entered_value != value:
-                            test_result = f"Failed - Numeric input did not accept valid number:\n'{value}'"
-
-                except ElementNotInteractableException:
-                    test_result = f"Failed - Element not intractable tested value (length {len(value)})"
-                except TimeoutException:
-                    test_result = "Failed - TimeoutException"
-                except StaleElementReferenceException:
-                    test_result = "Failed - StaleElementReferenceException"
-                except Exception as e:
-                    test_result = f"Failed - Exception: {str(e)}"
-
-                results[test_description] = test_result
+        elif input_type in TEXT_TYPES:
+            values = get_test_values(input_type, strategy)
+            descriptions = [f"{field['tag']} {input_type} {input_name} with tested value (length {len(value)})"
+                            for value in values]
+            verdicts = {}
+            # Only a sample is typed for real, unless the field cannot be filled and every value must fail like before
+            editable = field['visible'] and field['enabled'] and 'readonly' not in field['attributes']
+            typed = [value for value in values if value][:KEYSTROKE_SAMPLE] if editable else values
+            for index, value in enumerate(values):
+                if value in typed:
+                    verdicts[index] = type_value(input, input_type, value)
+            if editable:
+                injected_fields.append((input, input_type, values, verdicts))
+            field_verdicts.append((descriptions, verdicts))
+            for description in descriptions:
+                results[description] = None  # Keeps the fields in page order
 
         elif input_type in ["checkbox", "radio"]:
-            test_description = f"{input.tag_name} {input_type} {input_name}"
+            test_description = f"{field['tag']} {input_type} {input_name}"
             test_result = "passed - Clicked or Checked"
             try:
-                input.click() if not input.is_selected() else None
+                input.click() if not field['checked'] else None
             except Exception as e:
                 test_result = f"Failed - Exception: {str(e)}"
             results[test_description] = test_result
 
-        elif input.tag_name == "select":
-            test_description = f"{input.tag_name} {input_name}"
+        elif field['tag'] == "select":
+            test_description = f"{field['tag']} {input_name}"
             test_result = "passed - Options Selected"
             try:
                 select = Select(input)
@@ -144,15 +167,98 @@ def test_input_fields(form):
                             select.select_by_value(select_val)
                         elif not option.is_enabled():
                             test_result = f"Failed - Select element not enabled for option {option.text}"
-                        elif not input.is_displayed():
+                        elif not field['visible']:
                             test_result = f"Failed - Select element not displayed for option {option.text}"
             except Exception as e:
                 test_result = f"Failed - Exception: {str(e)}"
             results[test_description] = test_result
 
+    inject_values(form.parent, injected_fields)
+    for descriptions, verdicts in field_verdicts:
+        # Values are reported in test data order, a later value with the same length replaces the earlier one
+        for index, description in enumerate(descriptions):
+            results[description] = verdicts[index]
     return results
 
 
+def get_test_values(input_type, strategy=FILL_STRATEGY):
+    """
+    :param input_type: Type of the field.
+    :param strategy: Fill strategy, 'boundary' keeps the empty and longest values and the invalid numbers.
+    :return: Values to test on the field.
+    """
+    if strategy not in FILL_STRATEGIES:
+        raise ValueError(f"Unknown fill strategy '{strategy}', expected one of {', '.join(FILL_STRATEGIES)}")
+    values = test_data.get(input_type, ["test"])  # Use default ["test"] if input_type is not in test_data
+    if strategy == "boundary":
+        longest = max(values, key=len)
+        values = [value for value in values
+                  if value == "" or value == longest or (input_type == "number" and not value.isnumeric())]
+    return values
+
+
+def value_verdict(input_type, value, entered_value):
+    """Checks the value a field holds after it was filled."""
+    if input_type == "number":
+        if not value.isnumeric() and entered_value != "":
+            return f"Failed - Numeric input accepted non-numeric value:\n'{value}'"
+        elif value.isnumeric() and entered_value != value:
+            return f"Failed - Numeric input did not accept valid number:\n'{value}'"
+    return "passed - Filled or Checked"
+
+
+def failure_verdict(error, value):
+    if isinstance(error, ElementNotInteractableException):
+        return f"Failed - Element not intractable tested value (length {len(value)})"
+    if isinstance(error, TimeoutException):
+        return "Failed - TimeoutException"
+    if isinstance(error, StaleElementReferenceException):
+        return "Failed - StaleElementReferenceException"
+    return f"Failed - Exception: {str(error)}"
+
+
+def type_value(input, input_type, value):
+    """Types a value into a field with real keystrokes."""
+    try:
+        input.clear()  # Clear the input field before each test
+        input.send_keys(value)
+        entered_value = input.get_attribute("value") if input_type == "number" else None
+        return value_verdict(input_type, value, entered_value)
+    except Exception as e:
+        return failure_verdict(e, value)
+
+
+def inject_values(driver, injected_fields):
+    """
+    Fills the fields row by row with one script call per row and records the verdict of each value not typed yet.
+    :param driver: WebDriver instance.
+    :param injected_fields: List of (WebElement, input type, values, verdicts by value index) tuples.
+    """
+    if not injected_fields:
+        return
+    for row in build_rows([len(values) for _, _, values, _ in injected_fields]):
+        filled = [(field, index) for field, index in zip(injected_fields, row) if index is not None]
+        row_values = [field[2][index] for field, index in filled]
+        try:
+            entered_values = driver.execute_script(INJECT_VALUES_SCRIPT, [field[0] for field, _ in filled], row_values)
+            row_verdicts = [value_verdict(field[1], value, entered_value)
+                            for (field, _), value, entered_value in zip(filled, row_values, entered_values)]
+        except Exception as e:
+            row_verdicts = [failure_verdict(e, value) for value in row_values]
+        for ((_, _, _, verdicts), index), verdict in zip(filled, row_verdicts):
+            verdicts.setdefault(index, verdict)
+
+
+def build_rows(counts):
+    """
+    Plans which value each field holds in each fill of the form, every field gets its n-th value on the n-th row.
+    A verdict only depends on the value of its own field, so combining values across fields would not change any result.
+    :param counts: Number of values of each field.
+    :return: List of rows, with the value index of each field or None when the field is not filled on that row.
+    """
+    return [tuple(index if index < count else None for count in counts) for index in range(max(counts))]
+
+
 def get_button_text(button):
     # Try to get text directly from the button
     text = button.get_attribute('value').strip()
@@ -188,17 +294,34 @@ def test_form_submission(form, driver):
 
 def execute_forms_url_tests(url):
     """Load a URL and perform tests."""
-    driver = setup_selenium_driver()
-    driver.get(url)
-    results = perform_tests(driver)
-    driver.quit()
+    with browser_pool.lease() as driver:
+        driver.get(url)
+        results = perform_tests(driver)
     return results
 
 
 def execute_forms_html_tests(html_content):
     """Load HTML content and perform tests."""
-    driver = setup_selenium_driver()
-    load_html_content(driver, html_content)
-    results = perform_tests(driver)
-    driver.quit()
+    with browser_pool.lease() as driver:
+        load_html_content(driver, html_content)
+        results = perform_tests(driver)
     return results
+
+
+def execute_session_tests(session):
+    """Perform tests on the page loaded by a PageSession, on a fresh copy since the tests fill and submit it."""
+    if not session.needs_browser("form"):
+        return {}
+    previous = PreviousResults.for_session(session, f"forms {FILL_STRATEGY}")
+    with session.fork() as driver:
+        results = perform_tests(driver, previous=previous)
+    return results
+
+
+def iter_session_tests(session):
+    """Yield the form results of the page loaded by a PageSession as soon as each form was tested."""
+    if not session.needs_browser("form"):
+        return
+    previous = PreviousResults.for_session(session, f"forms {FILL_STRATEGY}")
+    with session.fork() as driver:
+        yield from iter_tests(driver, previous=previous)
@@ -0,0 +1,137 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from urllib.parse import urlsplit, urlunsplit
+
+# Cache configuration, an empty path disables the cache
+CACHE_PATH = os.environ.get("QA_LINK_CACHE_PATH", os.path.join("qa_cache", "link_status.sqlite3"))
+CACHE_TTL = float(os.environ.get("QA_LINK_CACHE_TTL", "3600"))
+CACHE_MAX_AGE = 7 * 24 * 3600  # Entries not revalidated for a week are dropped
+
+DEFAULT_PORTS = {"http": ":80", "https": ":443"}
+
+CachedLink = namedtuple("CachedLink", ["status_code", "content_length", "etag", "last_modified", "checked_at"])
+
+
+def normalize_url(url):
+    """
+    Normalizes a URL so equivalent spellings share one cache entry.
+    Lowercases the scheme and host, drops the default port and the fragment.
+    :param url: URL to normalize.
+    :return: Normalized URL.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    userinfo, _, hostport = parts.netloc.rpartition("@")
+    hostport = hostport.lower()
+    default_port = DEFAULT_PORTS.get(scheme)
+    if default_port and hostport.endswith(default_port):
+        hostport = hostport[:-len(default_port)]
+    netloc = f"{userinfo}@{hostport}" if userinfo else hostport
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, ""))
+
+
+class LinkStatusCache:
+    """
+    SQLite backed store of link check responses shared across runs.
+    Entries younger than the TTL are served directly, older ones are revalidated with a conditional request.
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS link_status ("
+                "url TEXT PRIMARY KEY, status_code INTEGER, content_length INTEGER, "
+                "etag TEXT, last_modified TEXT, checked_at REAL)"
+            )
+            connection.execute("DELETE FROM link_status WHERE checked_at < ?", (time.time() - CACHE_MAX_AGE,))
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def get(self, url):
+        """
+        :param url: Link URL.
+        :return: CachedLink entry or None when the link was never checked.
+        """
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT status_code, content_length, etag, last_modified, checked_at FROM link_status WHERE url = ?",
+                (normalize_url(url),)
+            ).fetchone()
+        return CachedLink(*row) if row else None
+
+    def is_fresh(self, entry):
+        return time.time() - entry.checked_at < self.ttl
+
+    def put(self, url, status_code, content_length, etag=None, last_modified=None):
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO link_status VALUES (?, ?, ?, ?, ?, ?)",
+                (normalize_url(url), status_code, content_length, etag, last_modified, time.time())
+            )
+            connection.commit()
+
+    def touch(self, url):
+        """Marks an entry as revalidated now, after the server answered 304 Not Modified."""
+        with self._lock:
+            connection = self._connect()
+            connection.execute("UPDATE link_status SET checked_at = ? WHERE url = ?",
+                               (time.time(), normalize_url(url)))
+            connection.commit()
+
+    def clear(self):
+        with self._lock:
+            connection = self._connect()
+            connection.execute("DELETE FROM link_status")
+            connection.commit()
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+def revalidation_headers(entry):
+    """
+    Builds the conditional request headers for a stale cache entry.
+    :param entry: CachedLink entry.
+    :return: Dictionary of request headers.
+    """
+    headers = {}
+    if entry.etag:
+        headers["If-None-Match"] = entry.etag
+    if entry.last_modified:
+        headers["If-Modified-Since"] = entry.last_modified
+    return headers
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_link_cache():
+    """
+    Returns the process-wide link status cache, or None when caching is disabled.
+    """
+    global _cache
+    if not CACHE_PATH:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = LinkStatusCache()
+    return _cache
@@ -1,6 +1,26 @@
+import os
+import sqlite3
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager, suppress
 from urllib.parse import urljoin, urlparse
 import requests
 from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from tests import link_cache
+
+MAX_WORKERS = int(os.environ.get("QA_LINK_WORKERS", "16"))
+MAX_PER_HOST = int(os.environ.get("QA_LINK_MAX_PER_HOST", "4"))
+REQUEST_TIMEOUT = float(os.environ.get("QA_LINK_TIMEOUT", "5"))
+MAX_BODY_BYTES = 1024 * 1024  # Larger bodies are not read to the end
+
+LinkResponse = namedtuple("LinkResponse", ["status_code", "content_length", "error"])
+
+_http_session = None
+_http_session_lock = threading.Lock()
+_host_semaphores = {}
+_host_semaphores_lock = threading.Lock()
 
 
 def extract_links_from_html(html_content):
@@ -15,42 +35,110 @@ def extract_links_from_html(html_content):
     return links
 
 
-def extract_links_from_page(url):
-    response = requests.get(url)
-    if response.status_code == 200:
-        soup = BeautifulSoup(response.content, 'html.parser')
-        links = soup.find_all('a')
-        # Ensure all URLs are absolute by combining the base URL with the relative URL
-        urls = [(urljoin(url, link.get('href')), str(link)) for link in links if link.get('href') is not None]
-        return urls
-    else:
-        return []
+def extract_links_from_page(url, html_content=None):
+    # Download the page only when its content was not already loaded by the caller
+    if html_content is None:
+        response = get_http_session().get(url, timeout=REQUEST_TIMEOUT)
+        if response.status_code != 200:
+            return []
+        html_content = response.content
+    soup = BeautifulSoup(html_content, 'html.parser')
+    links = soup.find_all('a')
+    # Ensure all URLs are absolute by combining the base URL with the relative URL
+    urls = [(urljoin(url, link.get('href')), str(link)) for link in links if link.get('href') is not None]
+    return urls
+
+
+def get_http_session():
+    """
+    Returns the shared HTTP session, its connection pool keeps connections alive between link checks.
+    """
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _http_session = session
+    return _http_session
+
+
+@contextmanager
+def host_limit(host):
+    """Caps the number of concurrent requests sent to a single host."""
+    with _host_semaphores_lock:
+        semaphore = _host_semaphores.setdefault(host, threading.BoundedSemaphore(MAX_PER_HOST))
+    with semaphore:
+        yield
+
 
+def is_local_link(link):
+    """Internal page links and mailto links are not requested."""
+    return link.startswith("#") or link.startswith("mailto:")
 
-def check_broken_link(link):
+
+def fetch_link(link):
+    """
+    Requests a link once, the response is shared by all the link checks.
+    Fresh entries of the link status cache are used without a request, stale ones are revalidated.
+    Cache errors, e.g. a database locked by another process, are treated as misses.
+    :param link: URL to request.
+    :return: LinkResponse with the status code, the number of body bytes read and the raised error if any.
+    """
+    cache = link_cache.get_link_cache()
+    try:
+        cached = cache.get(link) if cache else None
+    except sqlite3.Error:
+        cached = None
+    if cached and cache.is_fresh(cached):
+        return LinkResponse(cached.status_code, cached.content_length, None)
+    headers = link_cache.revalidation_headers(cached) if cached else {}
+    try:
+        with host_limit(urlparse(link).netloc):
+            with get_http_session().get(link, headers=headers, timeout=REQUEST_TIMEOUT, stream=True) as response:
+                if response.status_code == 304 and cached:
+                    with suppress(sqlite3.Error):
+                        cache.touch(link)
+                    return LinkResponse(cached.status_code, cached.content_length, None)
+                content_length = 0
+                for chunk in response.iter_content(chunk_size=8192):
+                    content_length += len(chunk)
+                    if content_length >= MAX_BODY_BYTES:
+                        break
+    except Exception as e:
+        return LinkResponse(None, 0, e)
+    if cache:
+        with suppress(sqlite3.Error):
+            cache.put(link, response.status_code, content_length,
+                      response.headers.get("ETag"), response.headers.get("Last-Modified"))
+    return LinkResponse(response.status_code, content_length, None)
+
+
+def check_broken_link(link, response=None):
     test_name = "Check Broken Link"
     # Skip internal page links and mailto links
-    if link.startswith("#") or link.startswith("mailto:"):
+    if is_local_link(link):
         return test_name, "passed"
-    try:
-        response = requests.head(link, allow_redirects=True, timeout=5)
+    response = response or fetch_link(link)
+    if response.error is None:
         if response.status_code == 200:
             return test_name, "passed"
         else:
             return test_name, f"failed - Status Code: {response.status_code}"
-    except requests.exceptions.InvalidURL:
+    elif isinstance(response.error, requests.exceptions.InvalidURL):
         return test_name, "failed - Invalid URL format"
-    except requests.exceptions.ConnectionError:
+    elif isinstance(response.error, requests.exceptions.ConnectionError):
         return test_name, "failed - Unable to connect"
-    except requests.RequestException:
+    elif isinstance(response.error, requests.RequestException):
         return test_name, "failed - Invalid Request"
-    except Exception:
+    else:
         return test_name, "failed - Failed to run test"
 
 
-def check_incorrect_url(link):
+def check_incorrect_url(link, response=None):
     test_name = "Check Valid URL Format"
-    # Check for valid URL, mailto link, or internal link
+    # Check for valid URL, mailto link, or internal link, the response is not needed
     parsed_url = urlparse(link)
     if link.startswith('#') or link.startswith("mailto:") or (
             parsed_url.scheme in ['http', 'https'] and parsed_url.netloc):
@@ -59,47 +147,88 @@ def check_incorrect_url(link):
         return test_name, "failed - URL does not start with 'http', 'https', or 'mailto'"
 
 
-def check_non_responsive_link(link):
+def check_non_responsive_link(link, response=None):
     test_name = "Check Responsive Link"
     # Skip internal page links and mailto links
-    if link.startswith("#") or link.startswith("mailto:"):
+    if is_local_link(link):
         return test_name, "passed"
-    try:
-        response = requests.get(link, timeout=5)
-        if response.status_code == 200 and len(response.content) > 0:
+    response = response or fetch_link(link)
+    if response.error is None:
+        if response.status_code == 200 and response.content_length > 0:
             return test_name, "passed"
         else:
             return test_name, f"failed - Status Code: {response.status_code}"
-    except requests.RequestException:
+    else:
         return test_name, f"failed - Failed to run test"
 
 
-def check_invalid_destination(link):
+def check_invalid_destination(link, response=None):
     test_name = "Check Invalid Destination"
     # Skip internal page links and mailto links
-    if link.startswith("#") or link.startswith("mailto:"):
+    if is_local_link(link):
         return test_name, "passed"
-    try:
-        response = requests.get(link, timeout=5)
+    response = response or fetch_link(link)
+    if response.error is None:
         if response.status_code == 404:
             return test_name, "failed - Page not found (404)"
         else:
             return test_name, "passed"
-    except requests.exceptions.ConnectionError:
+    elif isinstance(response.error, requests.exceptions.ConnectionError):
         return test_name, "failed - Unable to connect"
-    except requests.RequestException:
+    else:
         return test_name, "failed - Failed to run test"
 
 
-def run_tests_on_links(links):
-    results = {}
+def test_link(link, link_html, response=None):
+    """
+    Runs all the link checks on one link.
+    :param link: URL of the link.
+    :param link_html: HTML code of the link, reported as its code snippet.
+    :param response: LinkResponse shared by the checks, requested when not given.
+    :return: Dictionary of test results.
+    """
+    results = {
+        "code_snippet": link_html
+    }
+    for check in [check_broken_link, check_incorrect_url, check_non_responsive_link, check_invalid_destination]:
+        test_name, result = check(link, response)
+        results[test_name] = result
+    return results
+
+
+def iter_link_results(links):
+    """
+    Checks the links concurrently, every distinct URL is requested once.
+    Link results are not reused from previous runs, the link status cache already decides when a URL is requested again.
+    :param links: List of (URL, HTML code) tuples.
+    :return: Generator of (URL, test results) tuples, in the order the checks finish.
+    """
+    # A link found several times is reported once, with the last occurrence's code
+    link_snippets = {}
     for link, link_html in links:
-        results[link] = {
-            "code_snippet": link_html
-        }
-        for check in [check_broken_link, check_incorrect_url, check_non_responsive_link, check_invalid_destination]:
-            test_name, result = check(link)
-            results[link][test_name] = result
+        link_snippets[link] = link_html
+    remote_links = []
+    for link, link_html in link_snippets.items():
+        if is_local_link(link):
+            yield link, test_link(link, link_html)
+        else:
+            remote_links.append(link)
+    if not remote_links:
+        return
+    executor = ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(remote_links)))
+    try:
+        futures = {executor.submit(fetch_link, link): link for link in remote_links}
+        for future in as_completed(futures):
+            link = futures[future]
+            yield link, test_link(link, link_snippets[link], future.result())
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def run_tests_on_links(links):
+    checked = dict(iter_link_results(links))
+    # Report the links in page order
+    results = {link: checked[link] for link in dict.fromkeys(link for link, _ in links)}
     return results
 
 
@@ -113,3 +242,20 @@ def execute_html_tests(html_content):
     links = extract_links_from_html(html_content)
     results = run_tests_on_links(links)
     return results
+
+
+def get_session_links(session):
+    if session.is_url:
+        return extract_links_from_page(session.url, session.html)
+    return extract_links_from_html(session.html)
+
+
+def execute_session_tests(session):
+    """Run the link tests on the page already loaded by a PageSession."""
+    results = run_tests_on_links(get_session_links(session))
+    return results
+
+
+def iter_session_tests(session):
+    """Yield the link results of the page loaded by a PageSession as soon as each link was checked."""
+    yield from iter_link_results(get_session_links(session))
@@ -0,0 +1,70 @@
+import os
+
+# Resource URL patterns that none of the link, button or form checks need.
+# Stylesheets are never blocked, the visibility checks depend on them.
+IMAGE_PATTERNS = ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.bmp", "*.ico", "*.svg"]
+FONT_PATTERNS = ["*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot"]
+MEDIA_PATTERNS = ["*.mp4", "*.webm", "*.ogg", "*.mp3", "*.wav", "*.m4a", "*.mov", "*.m3u8"]
+TRACKER_PATTERNS = ["*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+                    "*googlesyndication.com*", "*connect.facebook.net*", "*hotjar.com*", "*segment.com*",
+                    "*mixpanel.com*", "*youtube.com/embed*", "*player.vimeo.com*"]
+
+LOAD_PROFILES = {
+    # Loads the page like a regular browser
+    "full": {
+        "page_load_strategy": "normal",
+        "images": True,
+        "extensions": True,
+        "window_size": None,
+        "blocked_urls": [],
+    },
+    # Skips everything the checks do not look at, for media-heavy pages
+    "light": {
+        "page_load_strategy": "eager",
+        "images": False,
+        "extensions": False,
+        "window_size": (800, 600),
+        "blocked_urls": IMAGE_PATTERNS + FONT_PATTERNS + MEDIA_PATTERNS + TRACKER_PATTERNS,
+    },
+}
+
+DEFAULT_PROFILE = os.environ.get("QA_LOAD_PROFILE", "full")
+
+
+def get_load_profile(name=None):
+    """
+    :param name: Profile name, defaults to DEFAULT_PROFILE.
+    :return: Profile name and settings.
+    """
+    name = name or DEFAULT_PROFILE
+    if name not in LOAD_PROFILES:
+        raise ValueError(f"Unknown load profile '{name}', expected one of {', '.join(LOAD_PROFILES)}")
+    return name, LOAD_PROFILES[name]
+
+
+def apply_launch_options(options, profile):
+    """
+    Sets the Chrome options of a profile that can only be chosen when the browser starts.
+    :param options: ChromeOptions instance.
+    :param profile: Profile settings.
+    """
+    options.page_load_strategy = profile["page_load_strategy"]
+    if not profile["images"]:
+        options.add_argument('--blink-settings=imagesEnabled=false')
+        options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+    if not profile["extensions"]:
+        options.add_argument('--disable-extensions')
+        options.add_argument('--mute-audio')
+    if profile["window_size"]:
+        options.add_argument('--window-size={},{}'.format(*profile["window_size"]))
+
+
+def apply_request_blocking(driver, profile):
+    """
+    Blocks the profile's resource URL patterns through CDP, they stay blocked across navigations.
+    :param driver: WebDriver instance.
+    :param profile: Profile settings.
+    """
+    if profile["blocked_urls"]:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": profile["blocked_urls"]})
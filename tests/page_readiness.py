@@ -0,0 +1,74 @@
+import os
+
+from selenium.common import TimeoutException, WebDriverException
+from selenium.webdriver.support.ui import WebDriverWait
+
+QUIET_WINDOW_MS = int(os.environ.get("QA_READY_QUIET_MS", "100"))
+
+# Resolves once the document is loaded and the DOM stopped changing for the quiet window,
+# or with false when the timeout expires first.
+WAIT_FOR_READY_SCRIPT = """
+const quietMs = arguments[0];
+const timeoutMs = arguments[1];
+const done = arguments[arguments.length - 1];
+let observer = null;
+let quietTimer = null;
+
+function finish(ready) {
+    if (observer) {
+        observer.disconnect();
+    }
+    clearTimeout(quietTimer);
+    clearTimeout(deadline);
+    done(ready);
+}
+
+function waitForQuiet() {
+    observer = new MutationObserver(() => {
+        clearTimeout(quietTimer);
+        quietTimer = setTimeout(() => finish(true), quietMs);
+    });
+    observer.observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+    quietTimer = setTimeout(() => finish(true), quietMs);
+}
+
+const deadline = setTimeout(() => finish(false), timeoutMs);
+if (document.readyState === 'complete') {
+    waitForQuiet();
+} else {
+    window.addEventListener('load', waitForQuiet, {once: true});
+}
+"""
+
+
+def wait_until_ready(driver, timeout, quiet_window_ms=QUIET_WINDOW_MS):
+    """
+    Waits until the page finished loading and its DOM stayed unchanged for a short quiet window.
+    A static page is ready after the quiet window, a page still rendering gets up to the timeout.
+    :param driver: WebDriver instance.
+    :param timeout: Maximum number of seconds to wait.
+    :param quiet_window_ms: Milliseconds without DOM mutations after which the page is considered ready.
+    :return: True if the page became ready before the timeout.
+    """
+    try:
+        driver.set_script_timeout(timeout + 1)
+        return bool(driver.execute_async_script(WAIT_FOR_READY_SCRIPT, quiet_window_ms, int(timeout * 1000)))
+    except WebDriverException:
+        # The page navigated or the script timed out, the presence check decides what is there
+        return False
+
+
+def wait_until_loaded(driver, timeout):
+    """
+    Waits until the document finished loading, without waiting for its DOM to stop changing.
+    Used where animated pages that never go quiet must not cost the full readiness timeout.
+    :param driver: WebDriver instance.
+    :param timeout: Maximum number of seconds to wait.
+    :return: True if the document loaded before the timeout.
+    """
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.05).until(
+            lambda d: d.execute_script("return document.readyState === 'complete'"))
+        return True
+    except (TimeoutException, WebDriverException):
+        return False
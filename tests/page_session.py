@@ -0,0 +1,118 @@
+import threading
+from contextlib import ExitStack, contextmanager
+
+from bs4 import BeautifulSoup
+
+from tests import browser_pool
+from tests.content_server import load_html_content
+from tests.load_profiles import get_load_profile
+
+
+class PageSession:
+    """
+    A target page loaded once into a pooled browser and shared by every test family.
+    Read-only consumers use the captured html, destructive steps (clicks, submits) go through fork().
+    """
+
+    def __init__(self, web_data, source=None, profile=None):
+        """
+        :param web_data: HTML code or URL.
+        :param source: File path or URL the page came from, used by the W3C validation.
+        :param profile: Load profile of the browsers the page is loaded in, see tests.load_profiles.
+        """
+        self.profile, _ = get_load_profile(profile)
+        self.is_url = web_data.startswith("http")
+        self.url = web_data if self.is_url else None
+        self.source = source or self.url
+        self.html = None if self.is_url else web_data
+        self.driver = None
+        self.cancelled = False
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._forks = set()
+        self._stack = ExitStack()
+        self._soup = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self._stack.__exit__(exc_type, exc_value, traceback)
+
+    def open(self):
+        """
+        Leases a browser and loads the page into it once.
+        HTML content is already known, so its browser is only leased by the first fork.
+        """
+        if self.is_url:
+            self.open_driver()
+        return self
+
+    def open_driver(self):
+        with ExitStack() as stack:
+            self.driver = stack.enter_context(browser_pool.lease(profile=self.profile))
+            self.load(self.driver)
+            if self.is_url:
+                self.html = self.driver.page_source
+            self._stack.enter_context(stack.pop_all())
+
+    def close(self):
+        self._stack.close()
+        self.driver = None
+
+    def load(self, driver):
+        """Loads the target page into the given driver."""
+        if self.is_url:
+            driver.get(self.url)
+        else:
+            load_html_content(driver, self.html, self.source)
+
+    def needs_browser(self, selector):
+        """
+        :param selector: CSS selector of the components a test family works on.
+        :return: False if the page has no such component and no script that could add one.
+        """
+        if self._soup is None:
+            self._soup = BeautifulSoup(self.html, 'html.parser')
+        return bool(self._soup.select_one(selector) or self._soup.find('script'))
+
+    @contextmanager
+    def fork(self):
+        """
+        Yields a driver holding a fresh copy of the page for destructive steps.
+        The first fork reuses the initial load and later ones reload the page. When the shared
+        browser is busy with another family, a free browser is borrowed from the pool instead.
+        """
+        with ExitStack() as stack:
+            driver = None
+            if not self._lock.acquire(blocking=False):
+                try:
+                    driver = stack.enter_context(browser_pool.lease(timeout=0, profile=self.profile))
+                except TimeoutError:
+                    # No free browser, wait for the shared one
+                    self._lock.acquire()
+            if driver is None:
+                stack.callback(self._lock.release)
+                if self.cancelled:
+                    raise RuntimeError("The page session was cancelled")
+                if self.driver is None:
+                    self.open_driver()
+                elif self._dirty:
+                    self.load(self.driver)
+                driver = self.driver
+                self._dirty = True
+            else:
+                self._forks.add(driver)
+                stack.callback(self._forks.discard, driver)
+                self.load(driver)
+            yield driver
+
+    def cancel(self):
+        """Stops the tests still running on the page by quitting the browsers they use."""
+        self.cancelled = True
+        for driver in [self.driver, *self._forks]:
+            if driver is not None:
+                try:
+                    driver.quit()
+                except Exception:
+                    pass
@@ -0,0 +1,170 @@
+import re
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+from tests.dom_snapshot import BUTTON_SELECTOR, FIELD_SELECTOR
+from tests.form_tests import check_field_type
+from tests.link_tests import check_incorrect_url
+
+HIDDEN_STYLE = re.compile(r"display\s*:\s*none|visibility\s*:\s*hidden", re.IGNORECASE)
+
+# Field types the form tests fill in or click, other inputs are ignored like in the browser
+TESTED_TYPES = ["text", "password", "email", "textarea", "number", "url", "date", "tel", "checkbox", "radio",
+                "select-one", "select-multiple"]
+
+# Values of the type attribute the browser keeps, any other value makes a text input
+INPUT_TYPES = {"button", "checkbox", "color", "date", "datetime-local", "email", "file", "hidden", "image", "month",
+               "number", "password", "radio", "range", "reset", "search", "submit", "tel", "text", "time", "url",
+               "week"}
+
+
+def parse_html(html_content):
+    return BeautifulSoup(html_content, 'html.parser')
+
+
+def is_hidden(tag):
+    """True if the markup hides the element or one of its ancestors, stylesheets are not evaluated."""
+    for element in [tag, *tag.parents]:
+        if element.has_attr('hidden') or HIDDEN_STYLE.search(element.get('style', '')):
+            return True
+    return tag.name == 'input' and tag.get('type', '').lower() == 'hidden'
+
+
+def is_disabled(tag):
+    """True if the control or an enclosing fieldset, select or optgroup is disabled."""
+    if tag.has_attr('disabled'):
+        return True
+    return any(parent.name in ('fieldset', 'select', 'optgroup') and parent.has_attr('disabled')
+               for parent in tag.parents)
+
+
+def test_links(soup, base_url=None):
+    """
+    Markup checks of the page links: missing or empty href, javascript: URLs and URL format.
+    :param soup: Parsed page.
+    :param base_url: URL of the page, relative links are made absolute with it.
+    :return: Dictionary of link -> test results, keyed like the link tests.
+    """
+    results = {}
+    for tag in soup.find_all('a'):
+        href = tag.get('href')
+        if href is None:
+            link = "no-href-attribute"
+            href_test = "failed - Link has no href attribute"
+        elif href.strip() == "":
+            link = "empty-href-attribute"
+            href_test = "failed - Link has an empty href attribute"
+        else:
+            link = urljoin(base_url, href) if base_url else href
+            href_test = "passed"
+        if href is not None and href.strip().lower().startswith("javascript:"):
+            javascript_test = "failed - Link runs a javascript: URL instead of navigating"
+        else:
+            javascript_test = "passed"
+        results[link] = {
+            "code_snippet": str(tag),
+            "Check Href Present": href_test,
+            "Check JavaScript Link": javascript_test,
+            "Check Valid URL Format": check_incorrect_url(link)[1],
+        }
+    return results
+
+
+def test_buttons(soup):
+    """
+    Markup checks of the page buttons: empty, hidden and disabled buttons.
+    :param soup: Parsed page.
+    :return: Dictionary of button description -> test results, keyed like the button tests.
+    """
+    results = {}
+    for index, button in enumerate(soup.select(BUTTON_SELECTOR)):
+        text = "" if button.name == 'input' else button.get_text(" ", strip=True)
+        button_text = text or button.get('title') or button.get('value') or "Unnamed Button"
+        button_description = f"Button {index + 1}: {button_text}"
+        hidden = is_hidden(button)
+        results[button_description] = {
+            "Visibility Test": "passed - Button is visible." if not hidden and button_text != "Unnamed Button" else "failed - Button is hidden.",
+            "Interactivity Test": "failed - Button is not interactive." if is_disabled(button) else "passed - Button is interactive.",
+            "Label Test": "failed - Button has no text, title or value." if button_text == "Unnamed Button" else "passed - Button has a label.",
+            "code_snippet": str(button)
+        }
+    return results
+
+
+def test_select_options(select):
+    """Same verdicts as the browser select test, the value of an option without value attribute is its text."""
+    test_result = "passed - Options Selected"
+    for option in select.find_all('option'):
+        option_text = option.get_text(" ", strip=True)
+        option_value = option.get('value', option_text)
+        if option_value == '':
+            test_result = f"Failed - Select option: ({option_text}) - does not match a value property)"
+        elif is_disabled(option):
+            test_result = f"Failed - Select element not enabled for option {option_text}"
+        elif option_value.lower() != option_text.lower() and is_hidden(select):
+            test_result = f"Failed - Select element not displayed for option {option_text}"
+    return test_result
+
+
+def get_field_type(field):
+    """The type property the browser gives a field, e.g. 'text' for an unknown input type and 'select-one'."""
+    if field.name == 'select':
+        return "select-multiple" if field.has_attr('multiple') else "select-one"
+    if field.name == 'textarea':
+        return "textarea"
+    input_type = field.get('type', 'text').strip().lower()
+    return input_type if input_type in INPUT_TYPES else "text"
+
+
+def test_form_fields(form):
+    """
+    Markup checks of a form's fields: name/type mismatches, disabled controls and select options missing values.
+    :param form: Parsed form element.
+    :return: Dictionary of test results.
+    """
+    results = {}
+    for field in form.select(FIELD_SELECTOR):
+        input_type = get_field_type(field)
+        input_name = field.get('name') or "Unnamed Input"
+
+        mismatch = check_field_type(field.name, input_type, input_name)
+        if mismatch:
+            results[mismatch[0]] = mismatch[1]
+        elif input_type not in TESTED_TYPES:
+            continue
+        elif is_disabled(field):
+            results[f"{field.name} {input_type} {input_name}"] = "Failed - Control is disabled"
+        elif field.name == 'select':
+            results[f"{field.name} {input_name}"] = test_select_options(field)
+    return results
+
+
+def test_forms(soup):
+    """
+    :param soup: Parsed page.
+    :return: Dictionary of form description -> test results, keyed like the form tests.
+    """
+    results = {}
+    for form_index, form in enumerate(soup.find_all('form')):
+        form_description = form.get('id') or f"Form {form_index + 1}"
+        results[form_description] = {
+            **test_form_fields(form),
+            "code_snippet": str(form)
+        }
+    return results
+
+
+def execute_static_tests(html_content, base_url=None):
+    """
+    Runs every check that can be decided from the markup alone, without starting a browser.
+    :param html_content: HTML code of the page.
+    :param base_url: URL of the page when it was downloaded.
+    :return: Dictionary of family -> component -> test results.
+    """
+    soup = parse_html(html_content)
+    return {
+        "links": test_links(soup, base_url),
+        "buttons": test_buttons(soup),
+        "forms": test_forms(soup)
+    }